@@ -0,0 +1,85 @@
+"""Micro-benchmark: the old inline email regex against email_matcher.find_emails.
+
+Times both on large and adversarial texts (long runs of dots and hyphens as left by
+minified pages, runs of "@", a multi-megabyte catalogue) at growing sizes, so the
+quadratic blow-up of the old pattern and the linear scaling of the matcher are visible.
+The old pattern is skipped once a single pass exceeds --legacy-limit seconds.
+
+    python benchmarks/bench_email_matcher.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_matcher import find_emails  # noqa: E402
+
+LEGACY_RE = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
+
+def legacy_find_emails(text):
+    """The pattern extract_emails_from_text used before email_matcher."""
+    return re.findall(LEGACY_RE, text)
+
+MATCHERS = {
+    "legacy-regex": legacy_find_emails,
+    "email_matcher": find_emails,
+}
+
+def inputs(size):
+    """Return (name, text) pairs of roughly ``size`` characters each."""
+    product = "Item {i}: refined palm olein, SKU APO-{i:05d}, image item-{i}@2x.png. "
+    return [
+        ("dot-hyphen run", "a" + "-." * (size // 2)),
+        ("minified line", "".join(f"v1.{i}.0---...---..." for i in range(size // 20)) + " desk@minified.example.com"),
+        ("at run", "@" * size),
+        ("local@ run", "a@" * (size // 2)),
+        ("catalogue", "".join(product.format(i=i) for i in range(size // 70)) + " orders@andhrapalm.com"),
+    ]
+
+def time_matcher(matcher, text, repeat):
+    """Best-of-``repeat`` wall time of one pass, and the emails it found."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        emails = matcher(text)
+        best = min(best, time.perf_counter() - start)
+    return best, emails
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="input lengths in characters")
+    parser.add_argument("--repeat", type=int, default=3, help="passes per input; the best is reported")
+    parser.add_argument("--legacy-limit", type=float, default=5.0,
+                        help="stop timing the old pattern on an input once a pass takes longer")
+    args = parser.parse_args()
+
+    rows = []
+    slow = set()
+    for size in sorted(args.sizes):
+        for name, text in inputs(size):
+            for matcher_name, matcher in MATCHERS.items():
+                if (matcher_name, name) in slow:
+                    rows.append({"Input": name, "Size": len(text), "Matcher": matcher_name,
+                                 "ms": None, "MB/s": None, "Emails": "skipped"})
+                    continue
+                seconds, emails = time_matcher(matcher, text, 1 if matcher_name == "legacy-regex" else args.repeat)
+                if seconds > args.legacy_limit:
+                    slow.add((matcher_name, name))
+                rows.append({
+                    "Input": name,
+                    "Size": len(text),
+                    "Matcher": matcher_name,
+                    "ms": round(seconds * 1000, 2),
+                    "MB/s": round(len(text) / seconds / 2 ** 20, 1) if seconds else float("inf"),
+                    "Emails": len(set(emails)),
+                })
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
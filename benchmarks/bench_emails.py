@@ -0,0 +1,169 @@
+"""Email-extraction benchmark: parser backends compared on a labelled HTML corpus.
+
+Times each stage of the homepage processing done by scrape_website_for_emails
+(parse, text extraction of the page and its footer, regex) for every available
+BeautifulSoup backend, a regex over the raw page and mainapp's single-pass
+scanner, and reports pages/second, peak memory and recall/false positives
+against the expected emails in email_corpus/labels.json. Large pages are
+generated at start-up rather than stored.
+
+    python benchmarks/bench_emails.py --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mainapp  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_corpus")
+PARSERS = ["html.parser", "lxml", "html5lib"]
+
+def load_corpus():
+    """Return a list of (name, html bytes, expected emails) including generated large pages."""
+    with open(os.path.join(CORPUS_DIR, "labels.json")) as f:
+        labels = json.load(f)
+    corpus = []
+    for name, expected in labels.items():
+        with open(os.path.join(CORPUS_DIR, name), "rb") as f:
+            corpus.append((name, f.read(), set(expected)))
+    corpus.extend(generated_pages())
+    return corpus
+
+def generated_pages():
+    """Build the large pages: a multi-megabyte catalogue, a minified one-liner and one without emails."""
+    product = (
+        '<div class="product"><h3>Item {i}</h3><p>Refined palm olein, 15 litre tin. '
+        'SKU APO-{i:05d}. Dispatch from Guntur warehouse.</p>'
+        '<img src="/img/item-{i}@2x.png"><a href="/products/{i}">Details</a></div>\n'
+    )
+    catalogue = "".join(product.format(i=i) for i in range(12000))
+    huge = (
+        "<html><head><title>Catalogue</title></head><body>" + catalogue +
+        "<footer>Orders: orders@andhrapalm.com</footer></body></html>"
+    ).encode()
+    minified_body = "".join(
+        f'<div class="c{i}"><span>v1.{i}.0</span><a href="/a/b/c/{i}">link</a><i>---...---...---</i></div>'
+        for i in range(20000)
+    )
+    minified = (
+        '<!DOCTYPE html><html><head><script>window.__STATE__={"contact":"desk@minified.example.com"};</script>'
+        "</head><body>" + minified_body + "<p>desk@minified.example.com</p></body></html>"
+    ).encode()
+    no_email = (
+        "<html><body>" + catalogue.replace("@2x", "") + "</body></html>"
+    ).encode()
+    return [
+        ("generated/huge_catalogue.html", huge, {"orders@andhrapalm.com"}),
+        ("generated/huge_minified.html", minified, {"desk@minified.example.com"}),
+        ("generated/huge_no_email.html", no_email, set()),
+    ]
+
+def extract_with_parser(content, parser, timings):
+    """Homepage processing of scrape_website_for_emails with a chosen backend, timing each stage."""
+    start = time.perf_counter()
+    soup = BeautifulSoup(content, parser)
+    parsed = time.perf_counter()
+    mainapp.mark_block_boundaries(soup)
+    texts = [soup.get_text()]
+    footer = soup.find("footer")
+    if footer:
+        texts.append(footer.get_text())
+    extracted = time.perf_counter()
+    emails = set()
+    for text in texts:
+        emails.update(mainapp.extract_emails_from_text(text))
+    done = time.perf_counter()
+    timings["parse"] += parsed - start
+    timings["text"] += extracted - parsed
+    timings["regex"] += done - extracted
+    return emails
+
+def extract_raw_regex(content, timings):
+    """Regex over the decoded raw page, as ttf.py does for contact pages; no parse at all."""
+    start = time.perf_counter()
+    text = content.decode("utf-8", errors="ignore")
+    decoded = time.perf_counter()
+    emails = set(mainapp.extract_emails_from_text(text))
+    done = time.perf_counter()
+    timings["text"] += decoded - start
+    timings["regex"] += done - decoded
+    return emails
+
+def extract_fast_scan(content, timings):
+    """mainapp's single-pass scanner, with its full-parse fallback counted as parse time."""
+    start = time.perf_counter()
+    page = mainapp.scan_page(content)
+    scanned = time.perf_counter()
+    timings["text"] += scanned - start
+    if page is None:
+        page = mainapp.parse_page(content)
+        timings["parse"] += time.perf_counter() - scanned
+    return page["emails"] | page["footer_emails"]
+
+EXTRACTORS = {
+    "raw-regex": extract_raw_regex,
+    "fast-scan": extract_fast_scan,
+}
+
+def extract(backend, content, timings):
+    if backend in EXTRACTORS:
+        return EXTRACTORS[backend](content, timings)
+    return extract_with_parser(content, backend, timings)
+
+def available_backends():
+    backends = [parser for parser in PARSERS if builder_registry.lookup(parser) is not None]
+    return backends + list(EXTRACTORS)
+
+def run_backend(backend, corpus, repeat):
+    """Benchmark one backend over the whole corpus and return its summary row."""
+    timings = {"parse": 0.0, "text": 0.0, "regex": 0.0}
+    found_expected = expected_total = false_positives = 0
+    peak = 0
+    for name, content, expected in corpus:
+        for _ in range(repeat):
+            emails = extract(backend, content, timings)
+        found_expected += len(emails & expected)
+        expected_total += len(expected)
+        false_positives += len(emails - expected)
+        # Memory is measured in a separate pass; tracemalloc would distort the timings
+        tracemalloc.start()
+        extract(backend, content, {"parse": 0.0, "text": 0.0, "regex": 0.0})
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    total = sum(timings.values())
+    pages = len(corpus) * repeat
+    return {
+        "Backend": backend,
+        "Pages/s": round(pages / total, 1) if total else float("inf"),
+        "Parse (ms/page)": round(timings["parse"] / pages * 1000, 2),
+        "Text (ms/page)": round(timings["text"] / pages * 1000, 2),
+        "Regex (ms/page)": round(timings["regex"] / pages * 1000, 2),
+        "Peak memory (MB)": round(peak / 2 ** 20, 1),
+        "Recall": round(found_expected / expected_total, 3) if expected_total else 1.0,
+        "False positives": false_positives,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="passes over each page")
+    parser.add_argument("--backend", action="append", help="limit to these backends (repeatable)")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    sizes = ", ".join(f"{name} ({len(content) / 1024:.0f} KiB)" for name, content, _ in corpus)
+    print(f"Corpus: {len(corpus)} pages: {sizes}\n")
+    backends = args.backend or available_backends()
+    rows = [run_backend(backend, corpus, args.repeat) for backend in backends]
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Throughput benchmark for scrape_google_maps against the local Maps stand-in.
+
+Reports listings per minute, WebDriver round-trips per place and wall time per
+stage, so a change to the scraper can be measured without touching live Google
+Maps. Needs Chromium and chromedriver as for the app itself.
+
+    python benchmarks/bench_scraper.py --results 100 --max-companies 50 --runs 3
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mainapp  # noqa: E402
+from maps_fixture_server import FixtureConfig, start_server  # noqa: E402
+
+def count_round_trips(driver):
+    """Wrap the driver's command executor so every WebDriver round-trip is counted."""
+    counter = {"commands": 0}
+    execute = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        counter["commands"] += 1
+        return execute(driver_command, params)
+
+    driver.execute = counting_execute
+    return counter
+
+def run_once(query, max_companies):
+    """Scrape one query from the stand-in and return its measurements."""
+    with mainapp.collect_run_metrics() as run_metrics:
+        start = time.perf_counter()
+        driver = mainapp.setup_chrome_driver()
+        if driver is None:
+            raise RuntimeError("Failed to initialize Chrome driver.")
+        try:
+            counter = count_round_trips(driver)
+            df = mainapp.scrape_google_maps(query, driver, max_companies=max_companies)
+        finally:
+            driver.quit()
+        wall = time.perf_counter() - start
+    places = 0 if df is None else len(df)
+    return {
+        "places": places,
+        "wall": wall,
+        "listings_per_minute": places / wall * 60 if wall else 0.0,
+        "round_trips_per_place": counter["commands"] / places if places else float("nan"),
+        "stages": run_metrics.summary(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--query", default="petrol bunks in guntur")
+    parser.add_argument("--results", type=int, default=100, help="places in the stand-in feed")
+    parser.add_argument("--max-companies", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every stand-in response")
+    parser.add_argument("--feed-latency", type=float, default=0.3)
+    parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server, base_url = start_server(FixtureConfig(
+        results=args.results, latency=args.latency, feed_latency=args.feed_latency
+    ))
+    mainapp.MAPS_BASE_URL = base_url
+    # Scroll curves are recorded as a side effect; keep them out of the app's places.db
+    db_dir = tempfile.TemporaryDirectory(prefix="bench_scraper_")
+    mainapp.PLACE_DB_PATH = os.path.join(db_dir.name, "places.db")
+    try:
+        for run in range(1, args.runs + 1):
+            result = run_once(args.query, args.max_companies)
+            print(f"run {run}: {result['places']} places in {result['wall']:.1f}s | "
+                  f"{result['listings_per_minute']:.1f} listings/min | "
+                  f"{result['round_trips_per_place']:.1f} WebDriver round-trips/place")
+            print(result["stages"].to_string(index=False))
+            print()
+    finally:
+        server.shutdown()
+        if mainapp._place_db is not None:
+            mainapp._place_db.close()
+        db_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
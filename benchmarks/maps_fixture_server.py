@@ -0,0 +1,208 @@
+"""Local stand-in for Google Maps used to benchmark scrape_google_maps offline.
+
+Serves a search page, an infinitely scrolling "Results for" feed and place pages
+with the same DOM hooks mainapp.py relies on (searchboxinput, DUwDvf,
+data-item-id="address", phone:tel:, authority). Run it directly and point the app
+at it with MAPS_BASE_URL=http://127.0.0.1:8765/maps, or use start_server() from a
+benchmark.
+"""
+import argparse
+import hashlib
+import html
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote, quote_plus
+
+SEARCH_PAGE = """<!DOCTYPE html>
+<html><head><title>Maps</title></head>
+<body>
+<input id="searchboxinput" type="text" autofocus>
+<script>
+document.getElementById("searchboxinput").addEventListener("keydown", function (e) {
+    if (e.key === "Enter") {
+        window.location = "/maps/search/" + encodeURIComponent(this.value);
+    }
+});
+</script>
+</body></html>
+"""
+
+RESULTS_PAGE = """<!DOCTYPE html>
+<html><head><title>{query} - Maps</title></head>
+<body>
+<div role="feed" aria-label="Results for {query}" style="height: 600px; overflow-y: scroll;">
+{items}
+</div>
+<script>
+var feed = document.querySelector('[role="feed"]');
+var offset = {offset};
+var loading = false;
+var done = {done};
+feed.addEventListener("scroll", function () {{
+    if (loading || done || feed.scrollTop + feed.clientHeight < feed.scrollHeight - 50) {{
+        return;
+    }}
+    loading = true;
+    fetch("/maps/feed?q={query_param}&offset=" + offset).then(function (r) {{ return r.json(); }}).then(function (data) {{
+        feed.insertAdjacentHTML("beforeend", data.html);
+        offset = data.offset;
+        done = data.done;
+        loading = false;
+    }});
+}});
+</script>
+</body></html>
+"""
+
+PLACE_PAGE = """<!DOCTYPE html>
+<html><head><title>{name} - Maps</title></head>
+<body>
+<h1 class="DUwDvf lfPIob">{name}</h1>
+<button data-item-id="address"><div class="Io6YTe fontBodyMedium">{address}</div></button>
+<button data-item-id="phone:tel:{phone}"><div class="Io6YTe fontBodyMedium">{phone}</div></button>
+{website}
+</body></html>
+"""
+
+END_OF_LIST = '<p class="HlvSq"><span>You\'ve reached the end of the list.</span></p>'
+
+class FixtureConfig:
+    """Knobs for the stand-in server."""
+
+    def __init__(self, results=200, page_size=20, latency=0.0, feed_latency=0.3,
+                 duplicate_rate=0.1, website_rate=0.8, website_host=None, seed=0):
+        self.results = results                # total places in every feed
+        self.page_size = page_size            # places added per feed load
+        self.latency = latency                # delay before every page response
+        self.feed_latency = feed_latency      # extra delay before each feed load
+        self.duplicate_rate = duplicate_rate  # share of feed items repeating a place under another URL
+        self.website_rate = website_rate      # share of places that list a website
+        self.website_host = website_host      # e.g. "127.0.0.1:8766" to serve websites locally
+        self.seed = seed
+
+def feature_id(query, index):
+    digest = hashlib.sha1(f"{query}:{index}".encode()).hexdigest()
+    return f"0x{digest[:16]}:0x{digest[16:32]}"
+
+def place_href(base, query, index, variant=0):
+    """Build a place URL shaped like the real ones: slug, viewport and data= with the feature id."""
+    slug = quote_plus(f"{query.title()} Place {index}")
+    lat = 16.3 + index * 0.001 + variant * 0.0001
+    return (f"{base}/maps/place/{slug}/@{lat:.4f},80.4400,{15 + variant}z"
+            f"/data=!3m1!4b1!4m6!3m5!1s{feature_id(query, index)}!8m2!3d{lat:.4f}!4d80.44")
+
+def feed_items(base, query, config, offset):
+    """Return the feed HTML for the next page, the new offset and whether the feed is exhausted."""
+    rng = random.Random(f"{config.seed}:{query}:{offset}")
+    end = min(offset + config.page_size, config.results)
+    items = []
+    for index in range(offset, end):
+        items.append(f'<div role="article"><a href="{html.escape(place_href(base, query, index))}">Place {index}</a></div>')
+        if index and rng.random() < config.duplicate_rate:
+            repeat = rng.randrange(index)
+            items.append(f'<div role="article"><a href="{html.escape(place_href(base, query, repeat, variant=1))}">Place {repeat}</a></div>')
+    done = end >= config.results
+    if done:
+        items.append(END_OF_LIST)
+    # Pad items so every page overflows the feed and can be scrolled
+    return "\n".join(f'<div style="height: 80px;">{item}</div>' for item in items), end, done
+
+def place_page(query, index, config):
+    rng = random.Random(f"{config.seed}:{query}:{index}")
+    website = ""
+    if rng.random() < config.website_rate:
+        host = config.website_host or f"place-{index}.example.test"
+        path = f"/site/{index}" if config.website_host else ""
+        website = (f'<a data-item-id="authority" href="http://{host}{path}">'
+                   f'<div class="Io6YTe fontBodyMedium">{host}{path}</div></a>')
+    return PLACE_PAGE.format(
+        name=html.escape(f"{query.title()} Place {index}"),
+        address=f"{index} Main Road, Guntur, Andhra Pradesh 5220{index % 10:02d}",
+        phone=f"+91 86{rng.randrange(10 ** 8):08d}",
+        website=website
+    )
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    config = FixtureConfig()
+
+    def do_GET(self):
+        config = self.config
+        if config.latency:
+            time.sleep(config.latency)
+        base = f"http://{self.headers.get('Host')}"
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        if path in ("/maps", "/maps/"):
+            return self.send_html(SEARCH_PAGE)
+        if path.startswith("/maps/search/"):
+            query = path[len("/maps/search/"):]
+            items, offset, done = feed_items(base, query, config, 0)
+            return self.send_html(RESULTS_PAGE.format(
+                query=html.escape(query), query_param=quote_plus(query), items=items,
+                offset=offset, done=json.dumps(done)
+            ))
+        if path == "/maps/feed":
+            params = parse_qs(parts.query)
+            query = params.get("q", [""])[0]
+            offset = int(params.get("offset", ["0"])[0])
+            if config.feed_latency:
+                time.sleep(config.feed_latency)
+            items, offset, done = feed_items(base, query, config, offset)
+            return self.send_body(json.dumps({"html": items, "offset": offset, "done": done}), "application/json")
+        if path.startswith("/maps/place/"):
+            slug = path[len("/maps/place/"):].split("/", 1)[0].replace("+", " ")
+            query, _, index = slug.rpartition(" Place ")
+            if index.isdigit():
+                return self.send_html(place_page(query.lower(), int(index), config))
+        self.send_error(404)
+
+    def send_html(self, body):
+        self.send_body(body, "text/html; charset=utf-8")
+
+    def send_body(self, body, content_type):
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Start the stand-in server in a background thread and return (server, maps_base_url)."""
+    handler = type("ConfiguredFixtureHandler", (FixtureHandler,), {"config": config or FixtureConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/maps"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--results", type=int, default=200, help="places per feed")
+    parser.add_argument("--page-size", type=int, default=20, help="places added per feed load")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--feed-latency", type=float, default=0.3, help="extra seconds per feed load")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--website-host", default=None)
+    args = parser.parse_args()
+    config = FixtureConfig(
+        results=args.results, page_size=args.page_size, latency=args.latency,
+        feed_latency=args.feed_latency, duplicate_rate=args.duplicate_rate, website_host=args.website_host
+    )
+    server, base_url = start_server(config, port=args.port)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    logging.info(f"Maps stand-in serving at {base_url} (set MAPS_BASE_URL to use it)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
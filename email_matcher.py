@@ -0,0 +1,67 @@
+"""Linear-time email matching with false-positive filtering.
+
+The old pattern, ``[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\\.[a-zA-Z0-9-.]+``, was retried from
+every offset of a long run of dots and hyphens, which is quadratic on minified pages.
+It also matched retina asset names such as ``logo@2x.png``. Here matching is anchored on
+each ``@``: the local part is read (backwards) from a bounded window before it and the
+domain from a bounded window after it, so the work per ``@`` is constant and the whole
+scan is linear in the length of the text. Candidates are then normalized and filtered.
+"""
+import re
+
+MAX_LOCAL_LENGTH = 64
+MAX_DOMAIN_LENGTH = 253
+
+# Both windows are bounded, so neither pattern can backtrack more than a constant amount.
+# LOCAL_RE is matched against the reversed text, reading the local part backwards from "@".
+LOCAL_RE = re.compile(r"[A-Za-z0-9._+-]{1,%d}" % (MAX_LOCAL_LENGTH + 1))
+DOMAIN_RE = re.compile(r"[A-Za-z0-9.-]{1,%d}" % (MAX_DOMAIN_LENGTH + 1))
+LABEL_RE = re.compile(r"[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\Z")
+LOCAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._+-")
+DOMAIN_START_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+TLD_RE = re.compile(r"(?:[a-z]{2,24}|xn--[a-z0-9-]{1,59})\Z")
+
+# File extensions that show up after an "@" in asset names (logo@2x.png, sprite@3x.webp)
+ASSET_EXTENSIONS = {
+    "png", "jpg", "jpeg", "gif", "webp", "svg", "avif", "bmp", "ico", "tif", "tiff",
+    "css", "js", "mjs", "map", "json", "xml", "woff", "woff2", "ttf", "eot", "otf",
+    "mp4", "webm", "mp3", "pdf", "zip", "php", "html", "htm", "asp", "aspx",
+}
+
+def normalize_email(local, domain):
+    """Return the normalized address for a local part and domain, or None if it is not plausible."""
+    local = local.lstrip(".")
+    domain = domain.strip(".-").lower()
+    if not local or not domain or len(local) > MAX_LOCAL_LENGTH or len(domain) > MAX_DOMAIN_LENGTH:
+        return None
+    if local.endswith(".") or ".." in local:
+        return None
+    labels = domain.split(".")
+    if len(labels) < 2 or not all(LABEL_RE.match(label) for label in labels):
+        return None
+    tld = labels[-1]
+    if not TLD_RE.match(tld) or tld in ASSET_EXTENSIONS:
+        return None
+    return f"{local.lower()}@{domain}"
+
+def find_emails(text):
+    """Return the distinct normalized email addresses in ``text``, in order of appearance."""
+    found = {}
+    reversed_text = None
+    at = text.find("@")
+    while at != -1:
+        # Cheap rejection of "@" that cannot be inside an address (handles, decorators, "@@@")
+        if at == 0 or at + 1 >= len(text) or text[at - 1] not in LOCAL_CHARS or text[at + 1] not in DOMAIN_START_CHARS:
+            at = text.find("@", at + 1)
+            continue
+        if reversed_text is None:
+            reversed_text = text[::-1]
+        start = len(text) - at
+        local = LOCAL_RE.match(reversed_text, start, start + MAX_LOCAL_LENGTH + 1)
+        domain = DOMAIN_RE.match(text, at + 1, at + 2 + MAX_DOMAIN_LENGTH)
+        if local and domain:
+            email = normalize_email(local.group(0)[::-1], domain.group(0))
+            if email:
+                found[email] = None
+        at = text.find("@", at + 1)
+    return list(found)
@@ -8,11 +8,34 @@ from selenium.webdriver.common.keys import Keys
 import pandas as pd
 import time
 import re
+import html
 from bs4 import BeautifulSoup
 import requests
-import io
 import platform
 import logging
+import os
+import sqlite3
+import threading
+import tempfile
+import uuid
+import contextlib
+import queue
+import socket
+import ipaddress
+import json
+from collections import deque
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from openpyxl import Workbook
+from email_matcher import find_emails
+from urllib.robotparser import RobotFileParser
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from urllib.parse import urlsplit, urlunsplit, urljoin, parse_qs, unquote, unquote_plus, urlencode
 
 # Configure logging
 logging.basicConfig(
@@ -21,8 +44,253 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 
-def setup_chrome_driver():
-    """Set up and return a Chrome WebDriver with additional options for cloud environment."""
+# Maps entry point; benchmarks point this at the local stand-in server
+MAPS_BASE_URL = os.environ.get("MAPS_BASE_URL", "https://www.google.com/maps")
+
+# Result storage for incremental refreshes
+PLACE_DB_PATH = os.environ.get("PLACE_DB_PATH", "places.db")
+QUERY_CACHE_TTL = 24 * 60 * 60      # a query re-run within this window is served from storage
+PLACE_ROW_TTL = 7 * 24 * 60 * 60    # stored places older than this are visited again on refresh
+
+_place_db = None
+_place_db_lock = threading.Lock()
+
+def get_place_db():
+    """Return the shared SQLite connection holding previously scraped places."""
+    global _place_db
+    with _place_db_lock:
+        if _place_db is None:
+            _place_db = sqlite3.connect(PLACE_DB_PATH, check_same_thread=False)
+            _place_db.executescript("""
+                CREATE TABLE IF NOT EXISTS places (
+                    place_key TEXT PRIMARY KEY,
+                    name TEXT, address TEXT, phone TEXT, website TEXT, email TEXT,
+                    scraped_at REAL, email_source TEXT
+                );
+                CREATE TABLE IF NOT EXISTS query_places (
+                    query TEXT, place_key TEXT,
+                    PRIMARY KEY (query, place_key)
+                );
+                CREATE TABLE IF NOT EXISTS queries (
+                    query TEXT PRIMARY KEY,
+                    refreshed_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS scroll_curves (
+                    query TEXT, run_at REAL, scroll INTEGER,
+                    seconds REAL, new_places INTEGER, total_places INTEGER, stop_reason TEXT
+                );
+            """)
+            # Databases created before email sources were recorded lack the column
+            columns = [row[1] for row in _place_db.execute("PRAGMA table_info(places)")]
+            if "email_source" not in columns:
+                _place_db.execute("ALTER TABLE places ADD COLUMN email_source TEXT")
+        return _place_db
+
+def normalize_query(search_query):
+    """Normalize a search query so trivially different spellings share stored results."""
+    return " ".join(search_query.lower().split())
+
+def load_stored_places(search_query):
+    """Load the places stored for a query, returning (refreshed_at, {place_key: row})."""
+    query = normalize_query(search_query)
+    db = get_place_db()
+    with _place_db_lock:
+        refreshed = db.execute("SELECT refreshed_at FROM queries WHERE query = ?", (query,)).fetchone()
+        rows = db.execute(
+            """SELECT p.place_key, p.name, p.address, p.phone, p.website, p.email, p.email_source, p.scraped_at
+               FROM places p JOIN query_places q ON q.place_key = p.place_key
+               WHERE q.query = ?""",
+            (query,)
+        ).fetchall()
+    stored = {}
+    for key, name, address, phone, website, email, email_source, scraped_at in rows:
+        stored[place_key_from_url(key)] = {
+            "Name": name,
+            "Address": address,
+            "Phone Number": phone,
+            "Website": website,
+            "Email": email,
+            "Email Source": email_source or "N/A",
+            "scraped_at": scraped_at
+        }
+    return (refreshed[0] if refreshed else None), stored
+
+def save_places(search_query, df, refreshed_keys, complete=True):
+    """Store the query's places, re-stamping only the rows that were scraped in this run.
+
+    Only a run that scraped Maps to the end (``complete=True``) marks the query as
+    refreshed and drops its links to places that no longer appear in the results. A
+    partial run, or one served from storage, keeps the rows but leaves the refresh time
+    alone, so the query is still scraped again once QUERY_CACHE_TTL has passed. Rows
+    whose email was "not checked" are stored without one, so the next run enriches them.
+    """
+    query = normalize_query(search_query)
+    now = time.time()
+    db = get_place_db()
+    with _place_db_lock, db:
+        for key, row in df.iterrows():
+            if key in refreshed_keys:
+                db.execute(
+                    """INSERT OR REPLACE INTO places
+                       (place_key, name, address, phone, website, email, email_source, scraped_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (key, row["Name"], row["Address"], row["Phone Number"], row["Website"],
+                     None if row.get("Email Source") == "not checked" else row["Email"],
+                     row.get("Email Source", "N/A"), now)
+                )
+            db.execute("INSERT OR IGNORE INTO query_places VALUES (?, ?)", (query, key))
+        if complete:
+            current = set(df.index)
+            stale = [(query, key) for (key,) in db.execute("SELECT place_key FROM query_places WHERE query = ?", (query,))
+                     if key not in current]
+            db.executemany("DELETE FROM query_places WHERE query = ? AND place_key = ?", stale)
+            db.execute("INSERT OR REPLACE INTO queries VALUES (?, ?)", (query, now))
+
+def save_scroll_curve(search_query, curve, stop_reason):
+    """Record a query's scroll yield curve, one row per scroll, for tuning the scroll thresholds."""
+    query = normalize_query(search_query)
+    now = time.time()
+    db = get_place_db()
+    try:
+        with _place_db_lock, db:
+            db.executemany(
+                "INSERT INTO scroll_curves VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(query, now, i + 1, seconds, new, total, stop_reason) for i, (seconds, new, total) in enumerate(curve)]
+            )
+    except Exception as e:
+        logging.warning(f"Could not record the scroll curve: {str(e)}")
+
+# Per-stage timing metrics
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")   # set to 0.0.0.0 to let a remote Prometheus scrape
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9108"))
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class StageMetrics:
+    """Counts, errors and latency histograms per scraper stage."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def observe(self, stage, seconds, error=False):
+        with self.lock:
+            entry = self.stages.setdefault(stage, {
+                "count": 0, "errors": 0, "sum": 0.0, "max": 0.0,
+                "buckets": [0] * len(LATENCY_BUCKETS)
+            })
+            entry["count"] += 1
+            entry["errors"] += int(error)
+            entry["sum"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+
+    def summary(self):
+        """Return a per-stage summary DataFrame for display."""
+        with self.lock:
+            rows = [{
+                "Stage": stage,
+                "Count": entry["count"],
+                "Errors": entry["errors"],
+                "Total (s)": round(entry["sum"], 2),
+                "Mean (s)": round(entry["sum"] / entry["count"], 3),
+                "Max (s)": round(entry["max"], 3),
+            } for stage, entry in self.stages.items()]
+        return pd.DataFrame(rows)
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP scraper_stage_duration_seconds Time spent per scraper stage.",
+            "# TYPE scraper_stage_duration_seconds histogram",
+        ]
+        with self.lock:
+            for stage, entry in self.stages.items():
+                for bound, count in zip(LATENCY_BUCKETS, entry["buckets"]):
+                    lines.append(f'scraper_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'scraper_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+                lines.append(f'scraper_stage_duration_seconds_sum{{stage="{stage}"}} {entry["sum"]}')
+                lines.append(f'scraper_stage_duration_seconds_count{{stage="{stage}"}} {entry["count"]}')
+            lines.append("# HELP scraper_stage_errors_total Failed scraper stage executions.")
+            lines.append("# TYPE scraper_stage_errors_total counter")
+            for stage, entry in self.stages.items():
+                lines.append(f'scraper_stage_errors_total{{stage="{stage}"}} {entry["errors"]}')
+        return "\n".join(lines) + "\n"
+
+PROCESS_METRICS = StageMetrics()
+_run_metrics = threading.local()
+
+@contextlib.contextmanager
+def collect_run_metrics(metrics=None):
+    """Additionally record stage timings from this thread into a per-run StageMetrics."""
+    metrics = metrics or StageMetrics()
+    previous = getattr(_run_metrics, "current", None)
+    _run_metrics.current = metrics
+    try:
+        yield metrics
+    finally:
+        _run_metrics.current = previous
+
+@contextlib.contextmanager
+def timed(stage):
+    """Time a stage into the process-wide metrics and the current run's metrics (usable as a decorator)."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        PROCESS_METRICS.observe(stage, elapsed, error)
+        run_metrics = getattr(_run_metrics, "current", None)
+        if run_metrics is not None:
+            run_metrics.observe(stage, elapsed, error)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve PROCESS_METRICS at /metrics for Prometheus."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = PROCESS_METRICS.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Start the /metrics endpoint once per process."""
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is not None:
+            return
+        try:
+            _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            logging.warning(f"Metrics endpoint not started on {host}:{port}: {str(e)}")
+            _metrics_server = False
+            return
+        threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        logging.info(f"Serving Prometheus metrics on {host}:{port}")
+
+@timed("driver_launch")
+def setup_chrome_driver(block_resources=False):
+    """Set up and return a Chrome WebDriver with additional options for cloud environment.
+
+    ``block_resources`` makes a lean renderer for RenderPool: images, fonts and media are
+    not loaded, JavaScript heap is capped and pages count as loaded at DOMContentLoaded.
+    """
     try:
         options = webdriver.ChromeOptions()
         options.add_argument("--headless")
@@ -33,6 +301,16 @@ def setup_chrome_driver():
         options.add_argument("--window-size=1920x1080")
         options.add_argument("--disable-features=VizDisplayCompositor")
         options.add_argument("--disable-extensions")
+        if block_resources:
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_argument("--js-flags=--max-old-space-size=256")
+            options.add_argument("--renderer-process-limit=1")
+            options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.managed_default_content_settings.fonts": 2,
+                "profile.managed_default_content_settings.media_stream": 2,
+            })
+            options.page_load_strategy = "eager"
         
         try:
             options.binary_location = "/usr/bin/chromium"
@@ -64,6 +342,7 @@ def setup_chrome_driver():
         logging.error(f"Error in setup_chrome_driver: {str(e)}")
         return None
 
+@timed("extract_data")
 def extract_data(xpath, driver):
     """Extract data from the page using the provided XPath."""
     try:
@@ -72,171 +351,2140 @@ def extract_data(xpath, driver):
     except:
         return "N/A"
 
-def scrape_google_maps(search_query, driver, max_companies=1000):
-    """Scrape Google Maps for company details based on the search query."""
+def place_key_from_url(href):
+    """Return the canonical identity of a Maps place URL.
+
+    Viewport (``@lat,lng,zoom``) and most ``data=`` parameters differ between links to the
+    same business, so the key is the feature id (``!1s0x..:0x..`` or ``ftid``), then a
+    ``place_id``/``cid`` parameter, and the lower-cased name slug as a last resort.
+    Keys are returned unchanged, so the function is safe to apply twice.
+    """
+    if not href:
+        return None
+    match = re.search(r"!1s(0x[0-9a-f]+:0x[0-9a-f]+)", unquote(href), re.IGNORECASE)
+    if match:
+        return f"fid:{match.group(1).lower()}"
+    params = parse_qs(urlsplit(href).query)
+    if params.get("ftid"):
+        return f"fid:{params['ftid'][0].lower()}"
+    for param in ("place_id", "cid"):
+        if params.get(param):
+            return f"{param}:{params[param][0]}"
+    match = re.search(r"/maps/place/([^/@?]+)", href)
+    if match:
+        return "name:" + " ".join(unquote_plus(match.group(1)).lower().split())
+    return href
+
+class PlaceStore:
+    """Results of one run, keyed by canonical place key.
+
+    Every stage goes through the store: the scroll harvest registers hrefs, detail visits
+    and enrichment fill in the row, and the export reads it back, so a business that shows
+    up under several URLs is fetched once per run.
+    """
+
+    def __init__(self):
+        self.hrefs = {}
+        self.rows = {}
+        self.aliases = {}
+        # Rows are written by a job thread while the UI thread takes snapshots
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.hrefs)
+
+    def add_href(self, href):
+        """Register a harvested href, returning its key or None if the place is already known."""
+        key = place_key_from_url(href)
+        if key is None or key in self.hrefs:
+            return None
+        self.hrefs[key] = href
+        return key
+
+    def has_row(self, key):
+        return key in self.rows or key in self.aliases
+
+    def add_alias(self, alias, key):
+        """Record that ``alias`` (e.g. the key of a redirected place page) is the same place as ``key``."""
+        if alias and alias != key and alias not in self.rows:
+            self.aliases[alias] = key
+
+    def put_row(self, key, row):
+        """Store a place row unless another stage already produced one for the key."""
+        with self.lock:
+            if key in self.rows:
+                return False
+            self.rows[key] = row
+            return True
+
+    def set_email(self, key, email, source="N/A"):
+        with self.lock:
+            self.rows[key]["Email"] = email
+            self.rows[key]["Email Source"] = source
+
+    def fill_phone(self, key, phone):
+        """Use a phone number found on the website when the listing has none."""
+        with self.lock:
+            if phone and self.rows[key].get("Phone Number") in (None, "", "N/A"):
+                self.rows[key]["Phone Number"] = phone
+
+    def pending_enrichment(self):
+        """Keys of places whose email has not been looked up yet."""
+        return [key for key, row in self.rows.items() if row.get("Email") is None]
+
+    def to_dataframe(self):
+        with self.lock:
+            if not self.rows:
+                return None
+            keys = list(self.rows)
+            rows = [dict(row) for row in self.rows.values()]
+        return pd.DataFrame(rows, index=pd.Index(keys, name="place_key"))
+
+class RunProgress:
+    """Cheap in-memory progress counters updated by the scraping engine.
+
+    The engine only bumps counters, from its own thread; the UI polls them and draws
+    them with a ``ProgressReporter``.
+    """
+
+    def __init__(self):
+        self.stage = "Starting"
+        self.done = 0
+        self.total = 0
+        self.errors = 0
+        self.stage_started = time.time()
+
+    def start_stage(self, stage, total=0):
+        self.stage = stage
+        self.done = 0
+        self.total = total
+        self.stage_started = time.time()
+
+    def advance(self, count=1, error=False):
+        self.done += count
+        if error:
+            self.errors += 1
+
+class Cancelled(BaseException):
+    """Raised inside a job once its CancelToken has been cancelled.
+
+    Like KeyboardInterrupt it is not an Exception, so the engine's many ``except Exception``
+    fallbacks let it through instead of carrying on with the next listing or page.
+    """
+
+class CancelToken:
+    """Cooperative cancellation for one scraping job.
+
+    The engine calls ``check()`` at every navigation and fetch and sleeps through
+    ``wait()``, which returns as soon as the token is cancelled, so a stopped job unwinds
+    within about a second. Callbacks registered with ``on_cancel`` (quitting a browser
+    that is blocked in a page load) run on the cancelling thread. With ``idle_timeout``
+    the token also cancels itself when the UI has not called ``touch()`` for that long,
+    which ends jobs whose browser tab was closed.
+    """
+
+    def __init__(self, idle_timeout=None):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.idle_timeout = idle_timeout
+        self.last_touch = time.time()
+        self.reason = None
+
+    def touch(self):
+        self.last_touch = time.time()
+
+    def cancel(self, reason="stopped"):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.reason = reason
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        logging.info(f"Cancelling job ({reason})")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.warning(f"Error while cancelling: {str(e)}")
+
+    def on_cancel(self, callback):
+        """Run ``callback`` on cancellation (at once if already cancelled); returns a function that unregisters it."""
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return lambda: self.callbacks.remove(callback) if callback in self.callbacks else None
+        callback()
+        return lambda: None
+
+    @property
+    def cancelled(self):
+        if not self.event.is_set() and self.idle_timeout and time.time() - self.last_touch > self.idle_timeout:
+            self.cancel("abandoned")
+        return self.event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+    def wait(self, seconds):
+        """Sleep for ``seconds`` unless cancelled first, in which case raise Cancelled."""
+        end = time.time() + seconds
+        while not self.cancelled:
+            remaining = end - time.time()
+            if remaining <= 0:
+                return
+            self.event.wait(min(remaining, 1.0))
+        raise Cancelled(self.reason)
+
+NEVER_CANCELLED = CancelToken()
+_cancel_token = threading.local()
+
+@contextlib.contextmanager
+def cancellable(token):
+    """Make ``token`` the current thread's cancel token (see current_cancel_token)."""
+    previous = getattr(_cancel_token, "current", None)
+    _cancel_token.current = token
     try:
-        driver.get("https://www.google.com/maps")
-        time.sleep(5)
+        yield token
+    finally:
+        _cancel_token.current = previous
+
+def current_cancel_token():
+    return getattr(_cancel_token, "current", None) or NEVER_CANCELLED
+
+def interruptible_sleep(seconds):
+    """time.sleep for the engine: wakes up and raises Cancelled when the current job is cancelled."""
+    current_cancel_token().wait(seconds)
+
+# Time budget per query; 0 means no deadline
+QUERY_DEADLINE = float(os.environ.get("QUERY_DEADLINE", "0"))
+# Share of the remaining time each engine stage may use, in the order the stages run
+DEADLINE_STAGE_SHARES = {"scroll": 0.2, "details": 0.45, "enrich": 0.3, "render": 0.05}
+
+class Deadline:
+    """Time budget of one query, split across the engine's stages.
+
+    A stage gets its share of whatever time is left when it starts, so time an earlier stage
+    did not use (or a stage that was skipped) carries over to the later ones. Stages call
+    ``stage_expired()`` in their loops and stop early; ``cut_stages`` records which ones
+    did, and any cut makes the result partial. ``Deadline(0)`` never expires.
+    """
+
+    def __init__(self, seconds=0, shares=DEADLINE_STAGE_SHARES):
+        self.ends_at = time.time() + seconds if seconds else None
+        self.shares = dict(shares)
+        self.stage = None
+        self.stage_ends_at = None
+        self.cut_stages = []
+
+    def remaining(self):
+        if self.ends_at is None:
+            return None
+        return max(0.0, self.ends_at - time.time())
+
+    def start_stage(self, stage):
+        self.stage = stage
+        if self.ends_at is None:
+            return
+        stages = list(self.shares)
+        upcoming = sum(self.shares[name] for name in stages[stages.index(stage):])
+        self.stage_ends_at = time.time() + self.remaining() * self.shares[stage] / upcoming
+
+    def stage_remaining(self):
+        if self.stage_ends_at is None:
+            return None
+        return max(0.0, self.stage_ends_at - time.time())
+
+    def stage_expired(self):
+        if self.stage_ends_at is None or time.time() < self.stage_ends_at:
+            return False
+        if self.stage not in self.cut_stages:
+            logging.info(f"Time budget for the {self.stage} stage used up; keeping partial results")
+            self.cut_stages.append(self.stage)
+        return True
+
+    @property
+    def partial(self):
+        return bool(self.cut_stages)
+
+class ProgressReporter:
+    """Draw a RunProgress snapshot into a progress bar; called on each UI poll."""
+
+    def __init__(self, placeholder):
+        self.placeholder = placeholder
+
+    def flush(self, progress, now=None):
+        now = now or time.time()
+        elapsed = max(now - progress.stage_started, 1e-6)
+        rate = progress.done / elapsed
+        text = f"{progress.stage}: {progress.done}"
+        if progress.total:
+            text += f"/{progress.total}"
+        text += f" · {rate:.1f}/s"
+        if progress.total and rate > 0:
+            eta = (progress.total - progress.done) / rate
+            text += f" · ETA {int(eta // 60)}m {int(eta % 60):02d}s"
+        if progress.errors:
+            text += f" · {progress.errors} errors"
+        fraction = min(progress.done / progress.total, 1.0) if progress.total else 0.0
+        self.placeholder.progress(fraction, text=text)
+
+# Scroll control: the feed is scrolled while it keeps yielding new places
+MAX_SCROLLS = 50                 # hard cap per query
+SCROLL_WAIT = 3.0                # longest wait for the feed to grow after a scroll
+SCROLL_POLL_INTERVAL = 0.5
+SCROLL_STALL_RETRIES = 2         # scrolls without new places (each waiting longer) before giving up
+SCROLL_YIELD_WINDOW = 3          # scrolls over which the marginal yield is measured
+SCROLL_MIN_YIELD = 0.5           # new places per second below which scrolling stops
+END_OF_LIST_XPATH = '//*[contains(@class, "HlvSq") or contains(text(), "reached the end of the list")]'
+
+def collect_listing_hrefs(search_query, driver, store, max_companies=1000, progress=None, deadline=None):
+    """Search Google Maps and scroll the results feed, registering each distinct place in the store.
+
+    Each scroll waits only until the feed grows (up to SCROLL_WAIT). Scrolling stops at the
+    end-of-list marker, after SCROLL_STALL_RETRIES scrolls in a row without new places,
+    when the yield over the last SCROLL_YIELD_WINDOW productive scrolls drops below
+    SCROLL_MIN_YIELD places per second, or at MAX_SCROLLS. Stalled scrolls are left out
+    of the yield window, so one slow load does not end a query that then recovers. The
+    yield curve is recorded by save_scroll_curve.
+    """
+    progress = progress or RunProgress()
+    deadline = deadline or Deadline()
+    deadline.start_stage("scroll")
+    progress.start_stage("Searching Google Maps")
+    with timed("search_submit"):
+        current_cancel_token().check()
+        driver.get(MAPS_BASE_URL)
+        interruptible_sleep(5)
         search_box = driver.find_element(By.XPATH, '//input[@id="searchboxinput"]')
         search_box.send_keys(search_query)
         search_box.send_keys(Keys.ENTER)
-        time.sleep(5)
-        
-        actions = ActionChains(driver)
-        for _ in range(10):
-            actions.key_down(Keys.CONTROL).send_keys("-").key_up(Keys.CONTROL).perform()
-            time.sleep(1)
-        
-        all_listings = set()
-        previous_count = 0
-        max_scrolls = 50
-        scroll_attempts = 0
-        
-        while scroll_attempts < max_scrolls:
-            try:
+        interruptible_sleep(5)
+    
+    actions = ActionChains(driver)
+    for _ in range(10):
+        actions.key_down(Keys.CONTROL).send_keys("-").key_up(Keys.CONTROL).perform()
+        interruptible_sleep(1)
+    
+    curve = []
+    productive = []                  # (seconds, new places) of the scrolls that found places
+    stalls = 0
+    stop_reason = "max_scrolls"
+    previous_count = 0
+    progress.start_stage("Scrolling results", total=max_companies)
+    
+    while len(curve) < MAX_SCROLLS:
+        try:
+            with timed("scroll"):
+                started = time.time()
+                known = len(store)
                 scrollable_div = driver.find_element(By.XPATH, '//div[contains(@aria-label, "Results for")]')
                 driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", scrollable_div)
-                time.sleep(3)
-                current_listings = driver.find_elements(By.XPATH, '//a[contains(@href, "https://www.google.com/maps/place")]')
-                current_count = len(current_listings)
+                # Wait only as long as the feed takes to grow; a stall gets a longer retry wait
+                wait = SCROLL_WAIT * (1 + stalls)
+                while True:
+                    interruptible_sleep(SCROLL_POLL_INTERVAL)
+                    current_listings = driver.find_elements(By.XPATH, f'//a[contains(@href, "{MAPS_BASE_URL}/place")]')
+                    if len(current_listings) > previous_count or time.time() - started >= wait:
+                        break
+                previous_count = len(current_listings)
                 
                 for listing in current_listings:
                     href = listing.get_attribute("href")
                     if href:
-                        all_listings.add(href)
-                
-                if current_count == previous_count or len(all_listings) >= max_companies:
+                        store.add_href(href)
+                end_of_list = bool(driver.find_elements(By.XPATH, END_OF_LIST_XPATH))
+            progress.advance(len(store) - progress.done)
+            curve.append((time.time() - started, len(store) - known, len(store)))
+            
+            if end_of_list:
+                stop_reason = "end_of_list"
+                break
+            if len(store) >= max_companies:
+                stop_reason = "max_companies"
+                break
+            if deadline.stage_expired():
+                stop_reason = "deadline"
+                break
+            if curve[-1][1] == 0:
+                stalls += 1
+                if stalls > SCROLL_STALL_RETRIES:
+                    stop_reason = "stalled"
                     break
-                previous_count = current_count
-                scroll_attempts += 1
-            except Exception as e:
-                logging.warning(f"Error during scrolling: {str(e)}")
+                continue
+            stalls = 0
+            productive.append(curve[-1][:2])
+            # Marginal yield: new places per second over the last few productive scrolls
+            window = productive[-SCROLL_YIELD_WINDOW:]
+            if len(productive) >= SCROLL_YIELD_WINDOW and \
+                    sum(new for _, new in window) / sum(seconds for seconds, _ in window) < SCROLL_MIN_YIELD:
+                stop_reason = "low_yield"
                 break
+        except Cancelled:
+            stop_reason = "cancelled"
+            break
+        except Exception as e:
+            logging.warning(f"Error during scrolling: {str(e)}")
+            progress.advance(0, error=True)
+            stop_reason = "error"
+            break
+    
+    logging.info(f"Stopped scrolling after {len(curve)} scrolls ({stop_reason}) with {len(store)} places")
+    save_scroll_curve(search_query, curve, stop_reason)
+    current_cancel_token().check()
+
+def scrape_place_details(href, driver):
+    """Visit a place page and extract its name, address, phone number and website."""
+    with timed("place_visit"):
+        current_cancel_token().check()
+        driver.get(href)
+        interruptible_sleep(3)
+    return {
+        "Name": extract_data('//h1[contains(@class, "DUwDvf lfPIob")]', driver),
+        "Address": extract_data('//button[@data-item-id="address"]//div[contains(@class, "fontBodyMedium")]', driver),
+        "Phone Number": extract_data('//button[contains(@data-item-id, "phone:tel:")]//div[contains(@class, "fontBodyMedium")]', driver),
+        "Website": extract_data('//a[@data-item-id="authority"]//div[contains(@class, "fontBodyMedium")]', driver)
+    }
+
+def iter_place_rows(search_query, driver, max_companies=1000, stored_places=None, row_ttl=PLACE_ROW_TTL, store=None, progress=None, deadline=None):
+    """Scrape Google Maps for the query, yielding each place's key as soon as its row is in the store.
+
+    Places found in ``stored_places`` that are younger than ``row_ttl`` are taken from
+    storage (including their email) instead of being visited again. Scrolling and visits
+    stop when their share of ``deadline`` is used up. Rows that still need email enrichment
+    have no Email.
+    """
+    stored_places = stored_places or {}
+    store = store if store is not None else PlaceStore()
+    progress = progress or RunProgress()
+    deadline = deadline or Deadline()
+    try:
+        collect_listing_hrefs(search_query, driver, store, max_companies, progress, deadline)
+        deadline.start_stage("details")
+        now = time.time()
         
-        results = []
-        for i, href in enumerate(all_listings): 
-            if i >= max_companies:
-                break
+        reused = 0
+        visited = 0
+        listings = list(store.hrefs.items())[:max_companies]
+        progress.start_stage("Visiting places", total=len(listings))
+        for i, (key, href) in enumerate(listings):
+            if store.has_row(key):
+                progress.advance()
+                continue
+            stored = stored_places.get(key)
+            if stored and now - stored["scraped_at"] < row_ttl:
+                store.put_row(key, {k: v for k, v in stored.items() if k != "scraped_at"})
+                reused += 1
+                progress.advance()
+                yield key
+                continue
+            # Out of time: stored rows are still taken above, but no more places are visited
+            if deadline.stage_expired():
+                progress.advance()
+                continue
             try:
-                driver.get(href)
-                time.sleep(3)
-                name = extract_data('//h1[contains(@class, "DUwDvf lfPIob")]', driver)
-                address = extract_data('//button[@data-item-id="address"]//div[contains(@class, "fontBodyMedium")]', driver)
-                phone = extract_data('//button[contains(@data-item-id, "phone:tel:")]//div[contains(@class, "fontBodyMedium")]', driver)
-                website = extract_data('//a[@data-item-id="authority"]//div[contains(@class, "fontBodyMedium")]', driver)
-                
-                results.append({
-                    "Name": name,
-                    "Address": address,
-                    "Phone Number": phone,
-                    "Website": website
-                })
-                logging.info(f"Scraped company: {name}")
+                row = scrape_place_details(href, driver)
+                row["Email"] = None
+                row["Email Source"] = None
+                visited += 1
+                # The place page may resolve to a canonical URL already covered by another listing
+                landed_key = place_key_from_url(driver.current_url)
+                if landed_key != key and store.has_row(landed_key):
+                    logging.info(f"Skipping duplicate listing for {row['Name']}")
+                    progress.advance()
+                    continue
+                store.put_row(key, row)
+                store.add_alias(landed_key, key)
+                logging.info(f"Scraped company: {row['Name']}")
+                progress.advance()
             except Exception as e:
                 logging.warning(f"Error processing listing {i+1}: {str(e)}")
+                progress.advance(error=True)
                 continue
+            yield key
         
-        return pd.DataFrame(results) if results else None
+        logging.info(f"Reused {reused} stored places, visited {visited} for '{search_query}'")
     except Exception as e:
         logging.error(f"Error in scrape_google_maps: {str(e)}")
-        return None
+
+def scrape_google_maps(search_query, driver, max_companies=1000, stored_places=None, row_ttl=PLACE_ROW_TTL, store=None, progress=None, deadline=None):
+    """Scrape Google Maps for company details based on the search query.
+
+    Runs iter_place_rows to the end and returns the store as a DataFrame indexed by place
+    key, or None if no place was scraped.
+    """
+    store = store if store is not None else PlaceStore()
+    for _ in iter_place_rows(search_query, driver, max_companies, stored_places, row_ttl, store, progress, deadline):
+        pass
+    return store.to_dataframe()
 
 def extract_emails_from_text(text):
-    """Extract email addresses from text using regex."""
-    return re.findall(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", text)
+    """Extract normalized email addresses from text, skipping asset names like logo@2x.png."""
+    return find_emails(text)
+
+def mailto_emails(links):
+    """Normalized addresses from ``mailto:`` links, in page order."""
+    emails = []
+    for link in links:
+        if link.lower().startswith("mailto:"):
+            emails.extend(find_emails(unquote(link[len("mailto:"):].split("?")[0])))
+    return list(dict.fromkeys(emails))
+
+# Structured contact data, in order of trust; the first source an address is seen in is kept
+EMAIL_SOURCES = ["json-ld", "microdata", "cfemail", "mailto", "page text", "contact page", "rendered page"]
+STRUCTURED_SOURCES = {"json-ld", "microdata"}
+JSON_LD_RE = re.compile(
+    r"""<script\b[^>]*\btype\s*=\s*["']?application/ld\+json["']?[^>]*>(.*?)</script\s*>""",
+    re.IGNORECASE | re.DOTALL
+)
+ITEMPROP_RE = re.compile(
+    r"""<[A-Za-z][A-Za-z0-9]*\b([^>]*\bitemprop\s*=\s*["']?(email|telephone)\b[^>]*)>([^<]*)""",
+    re.IGNORECASE
+)
+CONTENT_ATTR_RE = re.compile(r"""\bcontent\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+CFEMAIL_RE = re.compile(
+    r"""data-cfemail\s*=\s*["']?([0-9a-fA-F]+)|/cdn-cgi/l/email-protection#([0-9a-fA-F]+)"""
+)
+PHONE_RE = re.compile(r"\+?[0-9][0-9 ().-]{5,}[0-9]")
+
+def decode_cfemail(encoded):
+    """Decode a Cloudflare email-protection hex string: the first byte XORs the rest."""
+    try:
+        key = int(encoded[:2], 16)
+        return "".join(chr(int(encoded[i:i + 2], 16) ^ key) for i in range(2, len(encoded) - 1, 2))
+    except ValueError:
+        return ""
+
+def json_ld_contacts(node, emails, phones):
+    """Collect ``email`` and ``telephone`` values from a JSON-LD node and everything under it."""
+    if isinstance(node, list):
+        for item in node:
+            json_ld_contacts(item, emails, phones)
+    elif isinstance(node, dict):
+        for key, value in node.items():
+            if key in ("email", "telephone"):
+                for item in value if isinstance(value, list) else [value]:
+                    if not isinstance(item, str):
+                        continue
+                    if key == "email":
+                        emails.extend(find_emails(unquote(item.split(":", 1)[-1] if item.lower().startswith("mailto:") else item)))
+                    else:
+                        phones.extend(PHONE_RE.findall(item))
+            else:
+                json_ld_contacts(value, emails, phones)
+
+def extract_structured_contacts(content, links):
+    """Pull contact details a site publishes on purpose, without a browser.
+
+    Reads schema.org JSON-LD blocks and microdata ``itemprop`` values, decodes Cloudflare
+    ``data-cfemail`` obfuscation and takes ``mailto:``/``tel:`` links. Returns
+    ``{"emails": {email: source}, "phones": [...]}`` with sources from EMAIL_SOURCES.
+    """
+    text = content.decode("utf-8", errors="replace")
+    emails = {}
+    phones = []
+    
+    found = []
+    for block in JSON_LD_RE.findall(text):
+        # Script contents are raw text: unescaping first would turn an &quot; inside a string
+        # into a bare quote, so entities are only decoded for blocks that fail to parse as-is
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            try:
+                data = json.loads(html.unescape(block).strip())
+            except ValueError:
+                continue
+        json_ld_contacts(data, found, phones)
+    emails.update((email, "json-ld") for email in found)
+    
+    for attrs, prop, inner in ITEMPROP_RE.findall(text):
+        value = CONTENT_ATTR_RE.search(attrs) or HREF_RE.search(attrs)
+        value = html.unescape(next(g for g in value.groups() if g is not None)) if value else html.unescape(inner)
+        if prop.lower() == "email":
+            for email in find_emails(unquote(value)):
+                emails.setdefault(email, "microdata")
+        else:
+            phones.extend(PHONE_RE.findall(value))
+    
+    for groups in CFEMAIL_RE.findall(text):
+        for email in find_emails(decode_cfemail(groups[0] or groups[1])):
+            emails.setdefault(email, "cfemail")
+    
+    for email in mailto_emails(links):
+        emails.setdefault(email, "mailto")
+    for link in links:
+        if link.lower().startswith("tel:"):
+            phones.extend(PHONE_RE.findall(unquote(link[len("tel:"):])))
+    
+    return {"emails": emails, "phones": list(dict.fromkeys(phone.strip() for phone in phones))}
+
+# Single-pass page scanner: comments, skipped blocks (not part of get_text()), tags
+PAGE_TOKEN_RE = re.compile(
+    r"<!--.*?-->"
+    r"|<(script|style|template)\b[^>]*>.*?</\1\s*>"
+    r"|</?[A-Za-z][^>]*>"
+    r"|<[!?][^>]*>",
+    re.IGNORECASE | re.DOTALL
+)
+HREF_RE = re.compile(r"""\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+TAG_NAME_RE = re.compile(r"</?([A-Za-z][A-Za-z0-9]*)")
+# Text is split only at these elements' edges: inline markup such as info<span>@</span>x.com stays joined
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "details", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "main", "nav", "ol", "option", "p", "pre", "section", "summary",
+    "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+})
+
+def mark_block_boundaries(soup):
+    """Put newlines around block-level elements so soup.get_text() matches scan_page's text."""
+    for tag in soup.find_all(list(BLOCK_TAGS)):
+        # Inside the tag rather than around it: insert_before() scans the siblings, quadratic on long lists
+        tag.insert(0, "\n")
+        tag.append("\n")
+
+def scan_page(content):
+    """Extract emails and links from raw HTML in one pass, without building a soup.
+
+    Reproduces parse_page's ``get_text()`` after mark_block_boundaries: text nodes are
+    joined directly, with a newline at block-level tags (so "Sales" and "sales@..." in
+    adjacent paragraphs do not glue into one address, while ``info<span>@</span>x.com``
+    stays whole), and script, style, template and comment contents are skipped.
+    Returns a dict with ``emails``, ``footer_emails``, ``links`` (every ``<a href>``, in page
+    order), ``mailto`` addresses and ``text_chars`` (visible non-space characters), or None
+    when the page has constructs the scanner does not model and a full parse is needed.
+    """
+    try:
+        text = content.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    lowered = text.lower()
+    if "<![cdata[" in lowered or lowered.count("<script") != lowered.count("</script") \
+            or lowered.count("<!--") != lowered.count("-->"):
+        return None
+    
+    segments = []
+    footer_segments = []
+    footer_depth = 0
+    footer_done = False
+    links = []
+    position = 0
+    for match in PAGE_TOKEN_RE.finditer(text):
+        if match.start() > position:
+            segment = text[position:match.start()]
+            if "&" in segment:
+                segment = html.unescape(segment)
+            segments.append(segment)
+            if footer_depth:
+                footer_segments.append(segment)
+        position = match.end()
+        tag = match.group(0)
+        name = TAG_NAME_RE.match(tag)
+        if not name:
+            continue
+        name = name.group(1).lower()
+        if name in BLOCK_TAGS:
+            segments.append("\n")
+            if footer_depth:
+                footer_segments.append("\n")
+        if name == "a" and not tag.startswith("</"):
+            href = HREF_RE.search(tag)
+            if href:
+                links.append(html.unescape(next(group for group in href.groups() if group is not None)))
+        elif name == "footer" and not footer_done:
+            if tag.startswith("</"):
+                footer_depth = max(footer_depth - 1, 0)
+                footer_done = footer_depth == 0
+            elif not tag.endswith("/>"):
+                footer_depth += 1
+    if position < len(text):
+        segment = html.unescape(text[position:])
+        segments.append(segment)
+        if footer_depth:
+            footer_segments.append(segment)
+    
+    return {
+        "emails": set(extract_emails_from_text("".join(segments))),
+        "footer_emails": set(extract_emails_from_text("".join(footer_segments))),
+        "text_chars": sum(len("".join(segment.split())) for segment in segments),
+        "links": links,
+        "mailto": mailto_emails(links),
+    }
+
+def parse_page(content):
+    """Extract the same fields as scan_page by building a full BeautifulSoup tree."""
+    soup = BeautifulSoup(content, 'html.parser')
+    mark_block_boundaries(soup)
+    footer = soup.find('footer')
+    links = [a['href'] for a in soup.find_all('a', href=True)]
+    text = soup.get_text()
+    return {
+        "emails": set(extract_emails_from_text(text)),
+        "footer_emails": set(extract_emails_from_text(footer.get_text())) if footer else set(),
+        "text_chars": len("".join(text.split())),
+        "links": links,
+        "mailto": mailto_emails(links),
+    }
+
+def extract_page(content):
+    """Scan a page with the fast path, falling back to a full parse only when needed."""
+    with timed("page_scan"):
+        page = scan_page(content)
+    if page is None:
+        with timed("page_full_parse"):
+            page = parse_page(content)
+    with timed("page_structured"):
+        page["structured"] = extract_structured_contacts(content, page["links"])
+    return page
+
+# Crawl politeness
+ENRICH_WORKERS = 16              # concurrent website crawls per job
+MAX_CRAWL_WORKERS = int(os.environ.get("MAX_CRAWL_WORKERS", "32"))   # concurrent website crawls across all jobs
+GLOBAL_FETCH_RATE = 20.0         # website fetches per second across all hosts
+PER_HOST_RATE = 1.0              # fetches per second to one host without a Crawl-delay
+PER_HOST_BURST = 2
+MAX_RETRY_AFTER = 30             # longer Retry-After values give up on the page instead of waiting
+
+class TokenBucket:
+    """Token bucket that hands out reservations; the caller sleeps for the returned wait."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class CrawlScheduler:
+    """Process-wide politeness for website crawling.
+
+    Every fetch takes a token from its host's bucket and from a global bucket, and waits out
+    any backoff set for the host after a 429/503. ``map_by_host`` runs crawl tasks on a
+    worker pool with at most one active task per host, rotating across hosts so the workers
+    stay busy without hammering any single one. Both limits hold across concurrent jobs: a
+    host is crawled by one job at a time and at most MAX_CRAWL_WORKERS crawls run at once.
+    """
+
+    def __init__(self, global_rate=GLOBAL_FETCH_RATE, host_rate=PER_HOST_RATE, host_burst=PER_HOST_BURST):
+        self.lock = threading.Lock()
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.host_buckets = {}
+        self.blocked_until = {}
+        self.crawling = set()
+        self.crawl_slots = threading.BoundedSemaphore(MAX_CRAWL_WORKERS)
+
+    def _host_bucket(self, host):
+        bucket = self.host_buckets.get(host)
+        if bucket is None:
+            bucket = self.host_buckets[host] = TokenBucket(self.host_rate, self.host_burst)
+        return bucket
+
+    def set_crawl_delay(self, host, delay):
+        """Slow a host down to one fetch per ``delay`` seconds (from robots.txt)."""
+        if delay:
+            with self.lock:
+                self.host_buckets[host] = TokenBucket(min(1.0 / delay, self.host_rate), 1)
+
+    def backoff(self, host, seconds):
+        with self.lock:
+            self.blocked_until[host] = max(self.blocked_until.get(host, 0), time.time() + seconds)
+        logging.info(f"Backing off {host} for {seconds:.0f}s")
+
+    def is_blocked(self, host):
+        return self.blocked_until.get(host, 0) > time.time()
+
+    def acquire(self, url):
+        """Block until a fetch of ``url`` is allowed by the host and global limits."""
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            wait = max(
+                self._host_bucket(host).reserve(),
+                self.global_bucket.reserve(),
+                self.blocked_until.get(host, 0) - time.time()
+            )
+        if wait > 0:
+            with timed("politeness_wait"):
+                interruptible_sleep(wait)
+
+    def map_by_host(self, items, fn, workers=ENRICH_WORKERS, stop=None):
+        """Run ``fn(value)`` for each (key, host, value) and yield (key, result, error) as tasks finish.
+
+        Once ``stop()`` returns true no more tasks are started; results of finished tasks
+        are still yielded and tasks in flight are abandoned.
+        """
+        pending = {}
+        for key, host, value in items:
+            pending.setdefault(host, deque()).append((key, value))
+        total = sum(len(tasks) for tasks in pending.values())
+        if not total:
+            return
+        hosts = deque(pending)
+        condition = threading.Condition()
+        results = queue.Queue()
+        
+        def next_task():
+            # Prefer hosts that are neither busy nor backing off, in round-robin order
+            for allow_blocked in (False, True):
+                for _ in range(len(hosts)):
+                    host = hosts[0]
+                    hosts.rotate(-1)
+                    if not pending[host]:
+                        continue
+                    if allow_blocked or not self.is_blocked(host):
+                        with self.lock:
+                            if host in self.crawling:
+                                continue
+                            self.crawling.add(host)
+                        return host, pending[host].popleft()
+            return None
+        
+        def worker():
+            while True:
+                with condition:
+                    if stop is not None and stop():
+                        return
+                    task = next_task()
+                    while task is None:
+                        if not any(pending.values()):
+                            return
+                        condition.wait(1)
+                        if stop is not None and stop():
+                            return
+                        task = next_task()
+                host, (key, value) = task
+                try:
+                    while not self.crawl_slots.acquire(timeout=1):
+                        if stop is not None and stop():
+                            return
+                    try:
+                        results.put((key, fn(value), None))
+                    finally:
+                        self.crawl_slots.release()
+                except BaseException as e:
+                    # Includes Cancelled, so the consumer is never left waiting for this task
+                    results.put((key, None, e))
+                finally:
+                    with condition:
+                        with self.lock:
+                            self.crawling.discard(host)
+                        condition.notify_all()
+        
+        for _ in range(min(workers, total)):
+            threading.Thread(target=worker, daemon=True, name="crawl").start()
+        received = 0
+        while received < total:
+            try:
+                result = results.get(timeout=0.5 if stop is not None else None)
+            except queue.Empty:
+                if stop():
+                    with condition:
+                        pending.clear()
+                        condition.notify_all()
+                    return
+                continue
+            received += 1
+            yield result
+
+SCHEDULER = CrawlScheduler()
+
+def retry_after_seconds(response, default=10):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    value = response.headers.get("Retry-After", "").strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        return max((parsedate_to_datetime(value).timestamp() - time.time()), 0)
+    except (TypeError, ValueError):
+        return default
+
+# In-process DNS cache
+DNS_CACHE_TTL = 5 * 60           # getaddrinfo exposes no record TTL, so answers are kept this long
+DNS_NEGATIVE_TTL = 60            # NXDOMAIN answers
+DNS_PRERESOLVE_WORKERS = 32
+DEAD_DOMAIN_ERRORS = {socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)}
+
+class DnsCache:
+    """Caching wrapper around socket.getaddrinfo for the crawler's HTTP connections (see CRAWLER_SESSION)."""
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.next_prune = time.time() + DNS_CACHE_TTL
+
+    def store(self, key, ttl, answer):
+        now = time.time()
+        with self.lock:
+            self.entries[key] = (now + ttl, answer)
+            # Drop expired answers now and then, so hosts looked up once do not pile up
+            if now >= self.next_prune:
+                self.entries = {k: entry for k, entry in self.entries.items() if entry[0] > now}
+                self.next_prune = now + DNS_CACHE_TTL
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        if not isinstance(host, str) or is_ip_address(host) or not (port is None or isinstance(port, int)):
+            return self.resolver(host, port, family, type, proto, flags)
+        # Answers are cached per host and re-stamped with the requested port
+        key = (host.lower(), family, type, proto, flags)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry[0] > time.time():
+            if isinstance(entry[1], Exception):
+                raise entry[1]
+            return with_port(entry[1], port)
+        try:
+            result = self.resolver(host, 0, family, type, proto, flags)
+        except socket.gaierror as e:
+            if e.errno in DEAD_DOMAIN_ERRORS:
+                self.store(key, DNS_NEGATIVE_TTL, e)
+            raise
+        self.store(key, DNS_CACHE_TTL, result)
+        return with_port(result, port)
+
+def with_port(addrinfo, port):
+    return [(family, type_, proto, name, (sockaddr[0], port or 0) + tuple(sockaddr[2:]))
+            for family, type_, proto, name, sockaddr in addrinfo]
+
+def is_ip_address(host):
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+DNS_CACHE = DnsCache(socket.getaddrinfo)
+
+class CachedDnsConnectionMixin:
+    """urllib3 connection that resolves its host through DNS_CACHE.
+
+    Each cached address is tried in turn with ``_dns_host`` swapped for it, so TLS SNI,
+    certificate checks and the Host header still use the real host name.
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        if is_ip_address(host):
+            return super()._new_conn()
+        try:
+            addrinfo = DNS_CACHE.getaddrinfo(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NewConnectionError(self, f"Failed to resolve {host}: {e}") from e
+        error = NewConnectionError(self, f"No addresses for {host}")
+        for address in dict.fromkeys(sockaddr[0] for _, _, _, _, sockaddr in addrinfo):
+            self._dns_host = address
+            try:
+                return super()._new_conn()
+            except NewConnectionError as e:
+                error = e
+            finally:
+                self._dns_host = host
+        raise error
+
+class CachedDnsHTTPConnection(CachedDnsConnectionMixin, HTTPConnection):
+    pass
+
+class CachedDnsHTTPSConnection(CachedDnsConnectionMixin, HTTPSConnection):
+    pass
+
+class CachedDnsHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CachedDnsHTTPConnection
 
-def scrape_website_for_emails(url):
-    """Scrape a website for email addresses."""
+class CachedDnsHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CachedDnsHTTPSConnection
+
+class CachedDnsAdapter(HTTPAdapter):
+    """requests adapter whose connection pools resolve hosts through DNS_CACHE."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CachedDnsHTTPConnectionPool,
+            "https": CachedDnsHTTPSConnectionPool,
+        }
+
+def resolve_host(host):
+    """Resolve a host through the cache, returning False only if the domain does not exist."""
+    try:
+        DNS_CACHE.getaddrinfo(host, 443, 0, socket.SOCK_STREAM)
+        return True
+    except socket.gaierror as e:
+        return e.errno not in DEAD_DOMAIN_ERRORS
+    except Exception:
+        return True
+
+def preresolve_hosts(hosts):
+    """Resolve many hosts concurrently to warm the cache; returns the set of dead (NXDOMAIN) hosts."""
+    hosts = list(dict.fromkeys(hosts))
+    if not hosts:
+        return set()
+    with timed("dns_preresolve"):
+        with ThreadPoolExecutor(max_workers=min(DNS_PRERESOLVE_WORKERS, len(hosts)), thread_name_prefix="dns") as executor:
+            alive = dict(zip(hosts, executor.map(resolve_host, hosts)))
+    dead = {host for host, ok in alive.items() if not ok}
+    if dead:
+        logging.info(f"Dropping {len(dead)} websites whose domain does not resolve")
+    return dead
+
+# Website fetch limits
+MAX_PAGE_BYTES = 1024 * 1024     # stop reading a page after this many bytes
+CRAWLER_USER_AGENT = "CalibrageSearchBot"   # sent with every fetch and matched against robots.txt
+FETCH_CHUNK_BYTES = 64 * 1024
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".zip", ".rar",
+    ".mp4", ".mp3", ".avi", ".mov", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx"
+)
+
+# Shared by all crawl threads; only this session uses DNS_CACHE, the rest of the process resolves normally
+CRAWLER_SESSION = requests.Session()
+CRAWLER_SESSION.headers["User-Agent"] = CRAWLER_USER_AGENT
+CRAWLER_SESSION.mount("http://", CachedDnsAdapter(pool_connections=MAX_CRAWL_WORKERS))
+CRAWLER_SESSION.mount("https://", CachedDnsAdapter(pool_connections=MAX_CRAWL_WORKERS))
+
+def fetch_page(url, timeout=10, max_bytes=MAX_PAGE_BYTES, content_types=HTML_CONTENT_TYPES, ok_only=False):
+    """Fetch at most ``max_bytes`` of an HTML page.
+
+    The body is streamed and only read when the ``Content-Type`` is one of
+    ``content_types``, so links to brochures, images or videos cost one header round-trip
+    instead of a full download. Returns (content, final_url), or None when the resource
+    is not a page (or, with ``ok_only``, when the response is an HTTP error).
+    """
+    if urlsplit(url).path.lower().endswith(SKIPPED_EXTENSIONS):
+        return None
+    token = current_cancel_token()
+    for attempt in range(2):
+        SCHEDULER.acquire(url)
+        token.check()
+        response = CRAWLER_SESSION.get(url, timeout=timeout, stream=True)
+        if response.status_code not in (429, 503):
+            break
+        # Throttled: back the whole host off and retry once if the wait is reasonable
+        delay = retry_after_seconds(response)
+        response.close()
+        SCHEDULER.backoff(urlsplit(url).netloc.lower(), delay)
+        if attempt or delay > MAX_RETRY_AFTER:
+            return None
+    with response:
+        # Headers are in; a fetch cancelled meanwhile (e.g. a losing origin probe) stops before the body
+        token.check()
+        if ok_only and response.status_code >= 400:
+            return None
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in content_types:
+            logging.info(f"Skipping {url}: {content_type}")
+            return None
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=FETCH_CHUNK_BYTES):
+            # Leaving the with block closes the socket at once
+            token.check()
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                logging.info(f"Truncated {url} at {size} bytes")
+                break
+        return b"".join(chunks)[:max_bytes], response.url
+
+# Per-site scheme/redirect resolution
+ORIGIN_CACHE_TTL = 6 * 60 * 60
+ORIGIN_FAILURE_TTL = 10 * 60     # unreachable sites are retried sooner
+_origin_cache = {}
+_origin_cache_lock = threading.Lock()
+# Every crawl may be probing both schemes at once
+_probe_executor = ThreadPoolExecutor(max_workers=2 * MAX_CRAWL_WORKERS, thread_name_prefix="probe")
+
+def site_cache_key(website):
+    """Normalize a listing's website text into a cache key (host and path, no scheme)."""
+    website = website.strip().lower()
+    website = re.sub(r"^https?://", "", website)
+    return website.rstrip("/")
+
+def resolve_origin(website, timeout=10):
+    """Work out which scheme a website answers on and where it redirects, once per site.
+
+    Bare hostnames are probed over https and http concurrently, under the caller's cancel
+    token and run metrics. The first probe that gets a response wins; the other is
+    cancelled and stops once its headers arrive. The resolved origin is the URL the
+    winner ended up at after redirects (scheme, host and path, without the query), or the
+    probed URL itself when the response was not a page, and it is cached. Returns
+    (origin, homepage): ``homepage`` is the winning probe's fetch_page result, or None
+    when the origin came from the cache. ``origin`` is None when the site is unreachable.
+    """
+    key = site_cache_key(website)
+    with _origin_cache_lock:
+        cached = _origin_cache.get(key)
+    if cached and time.time() - cached[1] < (ORIGIN_CACHE_TTL if cached[0] else ORIGIN_FAILURE_TTL):
+        return cached[0], None
+    
+    if website.strip().lower().startswith(("http://", "https://")):
+        candidates = [website.strip()]
+    else:
+        candidates = [f"https://{key}", f"http://{key}"]
+    run_metrics = getattr(_run_metrics, "current", None)
+    token = current_cancel_token()
+    
+    def probe(url, probe_token):
+        with collect_run_metrics(run_metrics) if run_metrics else contextlib.nullcontext(), cancellable(probe_token):
+            return fetch_page(url, timeout)
+    
+    origin = homepage = None
+    probes = {}
+    with timed("origin_resolve"):
+        for url in candidates:
+            probe_token = CancelToken()
+            probes[_probe_executor.submit(probe, url, probe_token)] = (url, probe_token, token.on_cancel(probe_token.cancel))
+        try:
+            for done in as_completed(probes):
+                try:
+                    homepage = done.result()
+                except Exception as e:
+                    logging.info(f"Probe of {probes[done][0]} failed: {str(e)}")
+                    continue
+                final_url = homepage[1] if homepage else probes[done][0]
+                parts = urlsplit(final_url)
+                origin = f"{parts.scheme}://{parts.netloc}{parts.path or '/'}"
+                break
+        finally:
+            for future, (url, probe_token, unregister) in probes.items():
+                unregister()
+                if not future.done():
+                    probe_token.cancel("origin resolved")
+    with _origin_cache_lock:
+        _origin_cache[key] = (origin, time.time())
+    return origin, homepage
+
+# Contact-page discovery
+CONTACT_LINK_KEYWORDS = [
+    ("contact", 0), ("kontakt", 0), ("reach-us", 0), ("get-in-touch", 0), ("enquir", 0),
+    ("about", 1), ("imprint", 2), ("impressum", 2), ("legal", 3), ("support", 3),
+]
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+SECOND_LEVEL_SUFFIXES = {
+    "co.in", "org.in", "net.in", "gov.in", "ac.in", "firm.in", "gen.in", "ind.in",
+    "co.uk", "org.uk", "ac.uk", "com.au", "net.au", "org.au", "co.nz", "co.jp",
+    "com.sg", "com.my", "co.za", "com.br", "com.cn", "com.hk", "ae.org", "com.ae",
+}
+# Private suffixes of site builders and hosts: every subdomain is a different owner's site
+HOSTED_SITE_SUFFIXES = {
+    "business.site", "wixsite.com", "blogspot.com", "wordpress.com", "weebly.com",
+    "square.site", "godaddysites.com", "myshopify.com", "github.io", "netlify.app",
+    "web.app", "firebaseapp.com", "herokuapp.com", "vercel.app", "pages.dev",
+    "webflow.io", "mystrikingly.com", "jimdosite.com", "site123.me", "ueniweb.com",
+}
+# Hosts that serve many businesses' pages under different paths (facebook.com/<page>)
+PATH_TENANT_HOSTS = {
+    "facebook.com", "instagram.com", "linkedin.com", "twitter.com", "x.com",
+    "youtube.com", "sites.google.com", "business.google.com", "g.page", "linktr.ee",
+    "wixsite.com", "indiamart.com", "justdial.com", "tradeindia.com",
+}
+
+class CrawlBudget:
+    """Per-site limits on pages, bytes and seconds spent looking for emails."""
+
+    def __init__(self, max_pages=4, max_bytes=2 * 1024 * 1024, max_seconds=20):
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.deadline = time.time() + max_seconds
+        self.pages = 0
+        self.bytes = 0
+
+    def allows_fetch(self):
+        return self.pages < self.max_pages and self.bytes < self.max_bytes and time.time() < self.deadline
+
+    def remaining_bytes(self):
+        return max(self.max_bytes - self.bytes, 0)
+
+    def record(self, fetched):
+        self.pages += 1
+        if fetched is not None:
+            self.bytes += len(fetched[0])
+
+def registrable_domain(host):
+    """Approximate the registrable domain of a host (``shop.example.co.in`` -> ``example.co.in``).
+
+    Subdomains of HOSTED_SITE_SUFFIXES count as registrable (``acme.business.site``).
+    """
+    labels = host.lower().strip(".").split(".")
+    if labels[0] == "www":
+        labels = labels[1:]
+    suffix = ".".join(labels[-2:])
+    if len(labels) >= 3 and (suffix in SECOND_LEVEL_SUFFIXES or suffix in HOSTED_SITE_SUFFIXES):
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+def normalize_link(link, base_url):
+    """Resolve a link against the page URL and normalize it, or None if it is not a web page."""
+    try:
+        parts = urlsplit(urljoin(base_url, link.strip()))
+        port = parts.port
+    except ValueError:
+        # Malformed port or IPv6 literal, e.g. http://ex.com:abc/contact
+        return None
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if port and port != {"http": 80, "https": 443}[parts.scheme]:
+        host = f"{host}:{port}"
+    query = urlencode([
+        (name, value) for name, value in parse_qs(parts.query, keep_blank_values=True).items()
+        for value in value if not name.lower().startswith(TRACKING_PARAMS)
+    ])
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunsplit((parts.scheme, host, path, query, ""))
+
+def rank_contact_links(links, base_url):
+    """De-duplicate candidate contact pages on the same site and order them by likely value."""
+    site = registrable_domain(urlsplit(base_url).hostname or "")
+    base = normalize_link(base_url, base_url)
+    ranked = {}
+    for position, link in enumerate(links):
+        url = normalize_link(link, base_url)
+        if url is None or url == base or registrable_domain(urlsplit(url).hostname) != site:
+            continue
+        path = urlsplit(url).path.lower()
+        rank = min((rank for keyword, rank in CONTACT_LINK_KEYWORDS if keyword in path), default=None)
+        # www./bare host and letter case variants of one page are fetched once
+        duplicate_key = url.lower().replace("://www.", "://", 1)
+        if rank is not None and duplicate_key not in ranked:
+            ranked[duplicate_key] = (rank, position, url)
+    return [url for _, _, url in sorted(ranked.values())]
+
+# robots.txt / sitemap discovery
+SITE_HINTS_TTL = 24 * 60 * 60
+MAX_CRAWL_DELAY = 10             # ignore longer Crawl-delay values beyond this many seconds
+MAX_SITEMAP_BYTES = 512 * 1024
+MAX_SITEMAP_FILES = 3
+SITEMAP_CONTENT_TYPES = ("application/xml", "text/xml", "text/plain", "application/rss+xml")
+SITEMAP_LOC_RE = re.compile(r"<loc>\s*(.*?)\s*</loc>", re.IGNORECASE | re.DOTALL)
+_site_hints = {}
+_site_hints_lock = threading.Lock()
+
+def get_site_hints(url):
+    """Read a site's robots.txt and sitemaps once, returning crawl hints for its host.
+
+    The hints are ``crawl_delay`` (seconds, capped at MAX_CRAWL_DELAY), ``contact_urls``
+    (contact/imprint pages listed in the sitemaps, ranked like homepage links) and
+    ``robots`` (a parser used to skip disallowed pages). They are cached per host.
+    """
+    parts = urlsplit(url)
+    root = f"{parts.scheme}://{parts.netloc}"
+    with _site_hints_lock:
+        cached = _site_hints.get(parts.netloc)
+    if cached and time.time() - cached["fetched_at"] < SITE_HINTS_TTL:
+        return cached
+    
+    robots = RobotFileParser()
+    robots.parse([])
+    sitemaps = []
+    with timed("robots_fetch"):
+        try:
+            fetched = fetch_page(f"{root}/robots.txt", timeout=5, content_types=("text/plain",), ok_only=True)
+            if fetched is not None:
+                robots.parse(fetched[0].decode("utf-8", errors="ignore").splitlines())
+                sitemaps = robots.site_maps() or []
+        except Exception as e:
+            logging.info(f"No robots.txt for {root}: {str(e)}")
+    crawl_delay = robots.crawl_delay(CRAWLER_USER_AGENT) or 0
+    
+    locs = []
+    sitemap_urls = sitemaps or [f"{root}/sitemap.xml"]
+    fetched_files = 0
+    with timed("sitemap_fetch"):
+        while sitemap_urls and fetched_files < MAX_SITEMAP_FILES:
+            sitemap_url = sitemap_urls.pop(0)
+            if sitemap_url.lower().endswith(".gz"):
+                continue
+            fetched_files += 1
+            try:
+                fetched = fetch_page(sitemap_url, timeout=5, max_bytes=MAX_SITEMAP_BYTES,
+                                     content_types=SITEMAP_CONTENT_TYPES, ok_only=True)
+            except Exception as e:
+                logging.info(f"Could not read sitemap {sitemap_url}: {str(e)}")
+                continue
+            if fetched is None:
+                continue
+            for loc in SITEMAP_LOC_RE.findall(fetched[0].decode("utf-8", errors="ignore")):
+                loc = html.unescape(loc)
+                # Nested sitemaps of a sitemap index are followed, pages are collected
+                if loc.lower().split("?")[0].endswith(".xml"):
+                    sitemap_urls.append(loc)
+                else:
+                    locs.append(loc)
+    
+    SCHEDULER.set_crawl_delay(parts.netloc.lower(), min(float(crawl_delay), MAX_CRAWL_DELAY))
+    hints = {
+        "crawl_delay": min(float(crawl_delay), MAX_CRAWL_DELAY),
+        "contact_urls": rank_contact_links(locs, url),
+        "robots": robots,
+        "fetched_at": time.time(),
+    }
+    with _site_hints_lock:
+        _site_hints[parts.netloc] = hints
+    return hints
+
+def confident_emails(emails, url):
+    """Emails on the site's own domain; finding one is good enough to stop crawling."""
+    site = registrable_domain(urlsplit(url).hostname or "")
+    return {email for email in emails if registrable_domain(email.rsplit("@", 1)[-1]) == site}
+
+def scrape_website_for_emails(url, homepage=None, budget=None):
+    """Scrape a website for email addresses.
+
+    ``homepage`` is an already fetched (content, final_url) for ``url``, as returned by
+    resolve_origin, which saves fetching the homepage a second time. Structured contact
+    data (JSON-LD, microdata, Cloudflare-protected addresses and ``mailto:`` links) is taken
+    first; an address from JSON-LD or microdata ends the crawl on the homepage. Otherwise
+    ranked contact pages from the homepage and the site's sitemaps are fetched within the
+    site's CrawlBudget, honouring robots.txt (its Crawl-delay is applied by the SCHEDULER),
+    until an address on the site's own domain has been found.
+
+    Returns ``{"emails": {email: source}, "phones": [...], "client_rendered": bool}``, sources
+    being EMAIL_SOURCES; ``client_rendered`` marks a site with no emails whose homepage is
+    a near-empty script shell, worth a render_missing_emails pass.
+    """
+    budget = budget or CrawlBudget()
+    emails = {}
+    phones = []
+    shell = {"client_rendered": False}
+    
+    def add_page(page, text_source):
+        for email, source in page["structured"]["emails"].items():
+            emails.setdefault(email, source)
+        for email in page["emails"] | page["footer_emails"]:
+            emails.setdefault(email, text_source)
+        phones.extend(page["structured"]["phones"])
+    
+    def result():
+        return {
+            "emails": emails,
+            "phones": list(dict.fromkeys(phones)),
+            "client_rendered": shell["client_rendered"] and not emails,
+        }
+    
     try:
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        emails = set(extract_emails_from_text(soup.get_text()))
-        footer = soup.find('footer')
-        if footer:
-            emails.update(extract_emails_from_text(footer.get_text()))
+        if homepage is None:
+            with timed("email_homepage_fetch"):
+                homepage = fetch_page(url, max_bytes=min(MAX_PAGE_BYTES, budget.remaining_bytes()))
+        budget.record(homepage)
+        if homepage is None:
+            return result()
+        content, base_url = homepage
+        page = extract_page(content)
+        add_page(page, "page text")
+        shell["client_rendered"] = page["text_chars"] < RENDER_TEXT_THRESHOLD and b"<script" in content.lower()
+        if STRUCTURED_SOURCES & set(emails.values()) or confident_emails(emails, base_url):
+            return result()
         
-        contact_links = [a['href'] for a in soup.find_all('a', href=True) if 'contact' in a['href'].lower()]
-        for link in contact_links:
-            if not link.startswith("http"):
-                link = url.rstrip("/") + "/" + link.lstrip("/")
+        # More pages are needed: robots.txt gives the crawl delay and the sitemaps add
+        # contact pages that JS-rendered homepages do not link to in their HTML
+        hints = get_site_hints(base_url)
+        candidates = rank_contact_links(page["links"] + hints["contact_urls"], base_url)
+        for link in candidates:
+            if confident_emails(emails, base_url):
+                break
+            if not budget.allows_fetch():
+                logging.info(f"Crawl budget used up for {url}")
+                break
+            if not hints["robots"].can_fetch(CRAWLER_USER_AGENT, link):
+                continue
             try:
-                contact_response = requests.get(link, timeout=10)
-                contact_soup = BeautifulSoup(contact_response.content, 'html.parser')
-                emails.update(extract_emails_from_text(contact_soup.get_text()))
+                with timed("email_contact_fetch"):
+                    fetched = fetch_page(link, max_bytes=min(MAX_PAGE_BYTES, budget.remaining_bytes()))
+                budget.record(fetched)
+                if fetched is not None:
+                    contact_page = extract_page(fetched[0])
+                    add_page(contact_page, "contact page")
             except Exception:
+                budget.record(None)
                 continue 
-        return list(emails)
+        return result()
     except Exception:
-        return []
+        return result()
 
-def run_scraping(search_query, progress_placeholder, table_placeholder, success_placeholder, download_placeholder):
-    """Run scraping for the given search query."""
-    if not search_query.strip():
-        st.error("Please enter a valid search query.")
-        return
+def find_emails_for_website(website):
+    """Resolve a listing's website to its canonical origin and crawl it exactly once."""
+    origin, homepage = resolve_origin(website)
+    if origin is None:
+        logging.info(f"No reachable origin for {website}")
+        return {"emails": {}, "phones": [], "client_rendered": False}
+    return scrape_website_for_emails(origin, homepage)
+
+def is_path_tenant_host(host):
+    return any(host == tenant_host or host.endswith(f".{tenant_host}") for tenant_host in PATH_TENANT_HOSTS)
+
+def site_group_key(website, keep_branch_paths=False):
+    """Key under which listings share one crawl: the full host, plus the path if branches are kept apart.
+
+    On PATH_TENANT_HOSTS the path (and query, as in ``profile.php?id=``) always stays in
+    the key, since each path there is a different business.
+    """
+    key = site_cache_key(website)
+    parts = urlsplit(f"http://{key}")
+    host = re.sub(r"^www\.", "", parts.hostname or key)
+    path = parts.path.strip("/")
+    if is_path_tenant_host(host):
+        return f"{host}/{path}" + (f"?{parts.query}" if parts.query else "")
+    if keep_branch_paths and path:
+        return f"{host}/{path}"
+    return host
+
+def enrich_emails(store, keys, progress, keep_branch_paths=False, deadline=None):
+    """Find emails for the given places concurrently, one crawl per host at a time.
+
+    Chains and franchises list one corporate website on many places, so places are grouped
+    by site_group_key (the website's host, or host and path where one host serves many
+    businesses or with ``keep_branch_paths``). Each group is crawled once and its emails
+    are copied to every place in it. This is a generator: it yields the keys of each
+    group as its emails are set, and returns the (website, place keys) of client-rendered
+    sites where nothing was found, for render_missing_emails. Places not reached before
+    the enrich share of ``deadline`` runs out are marked "not checked".
+    """
+    run_metrics = getattr(_run_metrics, "current", None)
+    token = current_cancel_token()
+    deadline = deadline or Deadline()
+    deadline.start_stage("enrich")
     
-    driver = None
-    try:
-        driver = setup_chrome_driver()
+    def crawl(website):
+        with collect_run_metrics(run_metrics) if run_metrics else contextlib.nullcontext(), cancellable(token):
+            return find_emails_for_website(website)
+    
+    groups = {}
+    for key in keys:
+        website = store.rows[key]["Website"]
+        if website != "N/A" and isinstance(website, str) and website.strip():
+            groups.setdefault(site_group_key(website, keep_branch_paths), []).append(key)
+        else:
+            store.set_email(key, "N/A")
+            progress.advance()
+            yield [key]
+    
+    # Each group is crawled from its shortest website, usually the bare homepage
+    sites = {}
+    for group, members in groups.items():
+        website = min((store.rows[key]["Website"] for key in members), key=lambda w: len(site_cache_key(w)))
+        sites[group] = (urlsplit(f"http://{site_cache_key(website)}").hostname or website, website)
+    if len(sites) < sum(len(members) for members in groups.values()):
+        logging.info(f"Crawling {len(sites)} sites for {sum(len(m) for m in groups.values())} listings")
+    
+    # Dead domains are dropped before any HTTP attempt instead of burning a timeout each
+    dead = preresolve_hosts(host for host, _ in sites.values())
+    tasks = []
+    for group, (host, website) in sites.items():
+        if host in dead:
+            for key in groups[group]:
+                store.set_email(key, "N/A")
+            progress.advance(len(groups[group]))
+            yield groups[group]
+        else:
+            tasks.append((group, registrable_domain(host), website))
+    
+    render_candidates = []
+    for group, contacts, error in SCHEDULER.map_by_host(tasks, crawl, stop=lambda: token.cancelled or deadline.stage_expired()):
+        if isinstance(error, Cancelled):
+            continue
+        if error is not None:
+            logging.warning(f"Error scraping emails from {sites[group][1]}: {str(error)}")
+        if contacts and contacts.get("client_rendered"):
+            render_candidates.append((sites[group][1], groups[group]))
+        emails_found = contacts["emails"] if contacts else {}
+        sources = [source for source in EMAIL_SOURCES if source in emails_found.values()]
+        for key in groups[group]:
+            if emails_found:
+                store.set_email(key, ", ".join(emails_found), ", ".join(sources))
+            else:
+                store.set_email(key, "N/A")
+            store.fill_phone(key, contacts["phones"][0] if contacts and contacts["phones"] else None)
+        progress.advance(len(groups[group]), error=error is not None)
+        yield groups[group]
+    token.check()
+    
+    unchecked = [key for key in keys if store.rows[key].get("Email") is None]
+    for key in unchecked:
+        store.set_email(key, "N/A", "not checked")
+    if unchecked:
+        yield unchecked
+    return render_candidates
+
+# Second-tier enrichment: a few client-rendered sites are loaded in a real browser
+RENDER_WORKERS = 2               # headless browsers in the RenderPool
+RENDER_TEXT_THRESHOLD = 400      # homepages with less visible text than this may be script shells
+RENDER_MAX_SITES = 25            # sites rendered per run at most
+RENDER_PAGE_TIMEOUT = 15         # seconds for one page load in the renderer
+RENDER_SETTLE_SECONDS = 2        # wait for client-side content after DOMContentLoaded
+RENDER_PAGES_PER_DRIVER = 20     # a renderer is restarted after this many pages to cap its memory
+RENDER_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.avif",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.mp4", "*.webm", "*.mp3", "*.css",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+]
+
+class RenderPool:
+    """A small, bounded pool of lean headless browsers for rendering JavaScript-only sites.
+
+    Browsers are launched lazily with setup_chrome_driver(block_resources=True), reused for
+    up to RENDER_PAGES_PER_DRIVER pages and thrown away after any failure or timeout, so a
+    hung or bloated renderer never survives into the next page. ``close(force=True)`` also
+    quits browsers that are in use, which aborts their page loads.
+    """
+
+    def __init__(self, size=RENDER_WORKERS):
+        self.size = size
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.launched = 0
+        self.pages = {}
+        self.busy = set()
+        self.closed = False
+        self.broken = False
+
+    def checkout(self):
+        """Take an idle browser, launching one while under ``size``; None if none can run."""
+        while not self.broken and not self.closed:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    launch = self.launched < self.size
+                    if launch:
+                        self.launched += 1
+                if launch:
+                    driver = self.launch()
+                    if driver is None:
+                        return None
+                else:
+                    try:
+                        driver = self.idle.get(timeout=1)
+                    except queue.Empty:
+                        continue
+            with self.lock:
+                self.busy.add(driver)
+            return driver
+        return None
+
+    def launch(self):
+        driver = setup_chrome_driver(block_resources=True)
         if driver is None:
-            st.error("Failed to initialize Chrome driver.")
+            # A browser that cannot start now will not start for the next site either
+            logging.warning("Renderer could not be launched; skipping the render pass")
+            self.broken = True
+            with self.lock:
+                self.launched -= 1
+            return None
+        driver.set_page_load_timeout(RENDER_PAGE_TIMEOUT)
+        driver.set_script_timeout(RENDER_PAGE_TIMEOUT)
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": RENDER_BLOCKED_URLS})
+        except Exception as e:
+            logging.warning(f"Could not block resources in the renderer: {str(e)}")
+        self.pages[id(driver)] = 0
+        return driver
+
+    def release(self, driver, healthy=True):
+        with self.lock:
+            self.busy.discard(driver)
+        self.pages[id(driver)] = self.pages.get(id(driver), 0) + 1
+        if healthy and not self.closed and self.pages[id(driver)] < RENDER_PAGES_PER_DRIVER:
+            self.idle.put(driver)
             return
-        
-        df = scrape_google_maps(search_query, driver, max_companies=1000)
-        
-        if df is not None and not df.empty:
-            websites = df["Website"].tolist()
-            email_results = []
-            progress_bar = progress_placeholder.progress(0)
-            
-            for i, website in enumerate(websites):
-                if website != "N/A" and isinstance(website, str) and website.strip():
-                    urls_to_try = [f"http://{website}", f"https://{website}"]
-                    emails_found = []
-                    for url in urls_to_try:
-                        try:
-                            emails = scrape_website_for_emails(url)
-                            emails_found.extend(emails)
-                        except Exception as e:
-                            logging.warning(f"Error scraping emails from {url}: {str(e)}")
-                    email_results.append(", ".join(set(emails_found)) if emails_found else "N/A")
-                else:
-                    email_results.append("N/A")
-                progress_bar.progress((i + 1) / len(websites))
-            
-            df["Email"] = email_results
-            excel_data = io.BytesIO()
-            with pd.ExcelWriter(excel_data, engine="openpyxl") as writer:
-                df.to_excel(writer, index=False)
-            excel_data.seek(0)
-            
-            st.session_state.scraping_completed = True
-            table_placeholder.table(df)
-            success_placeholder.success("Done! 👇Click Download Button Below")
-            download_placeholder.download_button(
-                label="Download Results",
-                data=excel_data,
-                file_name="Calibrage_Data_Extraction.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                on_click=lambda: setattr(st.session_state, 'download_clicked', True)
-            )
-        else:
-            st.warning("No results found for the given search query.")
-    except Exception as e:
-        st.error(f"An error occurred during scraping: {str(e)}")
-    finally:
-        if driver:
+        self.pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self.lock:
+            self.launched -= 1
+
+    @timed("render_page")
+    def render(self, url):
+        """Load ``url`` in a pooled browser and return its rendered HTML as bytes, or None."""
+        driver = self.checkout()
+        if driver is None:
+            return None
+        healthy = False
+        try:
+            current_cancel_token().check()
+            driver.get(url)
+            interruptible_sleep(RENDER_SETTLE_SECONDS)
+            content = driver.page_source.encode("utf-8", errors="ignore")[:MAX_PAGE_BYTES]
+            healthy = True
+            return content
+        except Exception as e:
+            logging.info(f"Render failed for {url}: {str(e)}")
+            return None
+        finally:
+            self.release(driver, healthy)
+
+    def close(self, force=False):
+        self.closed = True
+        if force:
+            with self.lock:
+                busy = list(self.busy)
+            for driver in busy:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
             try:
                 driver.quit()
-            except:
+            except Exception:
                 pass
 
+def render_website_for_emails(website, pool):
+    """Render a client-side site's homepage, then its best contact page, looking for emails."""
+    origin, _ = resolve_origin(website)
+    if origin is None:
+        return {}
+    hints = get_site_hints(origin)
+    emails = {}
+    urls = [origin]
+    while urls and len(urls) <= 2:
+        url = urls.pop(0)
+        if not hints["robots"].can_fetch(CRAWLER_USER_AGENT, url):
+            continue
+        SCHEDULER.acquire(url)
+        content = pool.render(url)
+        if content is None:
+            break
+        page = extract_page(content)
+        for email in list(page["structured"]["emails"]) + sorted(page["emails"]):
+            emails.setdefault(email, "rendered page")
+        if confident_emails(emails, origin) or url != origin:
+            break
+        urls.extend(rank_contact_links(page["links"] + hints["contact_urls"], origin)[:1])
+    return emails
+
+def render_missing_emails(store, candidates, progress, deadline=None):
+    """Second-tier pass: render the client-side sites enrich_emails found no emails on.
+
+    ``candidates`` are the (website, place keys) pairs returned by enrich_emails. Only the
+    first RENDER_MAX_SITES are rendered, with RENDER_WORKERS browsers at most, and sites
+    not done when the render share of ``deadline`` runs out are left as they are. Yields
+    the keys of each rendered site's places.
+    """
+    candidates = candidates[:RENDER_MAX_SITES]
+    if not candidates:
+        return
+    run_metrics = getattr(_run_metrics, "current", None)
+    token = current_cancel_token()
+    deadline = deadline or Deadline()
+    deadline.start_stage("render")
+    # The caller holds this many BROWSER_ADMISSION slots for the pass
+    pool = RenderPool(min(RENDER_WORKERS, BROWSER_ADMISSION.slots))
+    
+    def render(website):
+        with collect_run_metrics(run_metrics) if run_metrics else contextlib.nullcontext(), cancellable(token):
+            return render_website_for_emails(website, pool)
+    
+    executor = ThreadPoolExecutor(max_workers=pool.size)
+    # Browsers blocked in a page load are quit from the cancelling thread
+    unregister = token.on_cancel(lambda: pool.close(force=True))
+    try:
+        futures = {executor.submit(render, website): keys for website, keys in candidates}
+        for future in as_completed(futures, timeout=deadline.stage_remaining()):
+            keys = futures[future]
+            try:
+                emails = future.result()
+            except Cancelled:
+                break
+            except Exception as e:
+                logging.warning(f"Error rendering website: {str(e)}")
+                emails = {}
+            if emails:
+                for key in keys:
+                    store.set_email(key, ", ".join(emails), "rendered page")
+            progress.advance(len(keys))
+            yield keys
+    except FutureTimeoutError:
+        deadline.stage_expired()
+    finally:
+        unregister()
+        executor.shutdown(wait=False, cancel_futures=True)
+        pool.close()
+    token.check()
+
+# Server-wide capacity: every session shares these browser slots
+MAX_BROWSERS = int(os.environ.get("MAX_BROWSERS", "4"))   # headless browsers (Maps drivers and renderers) at once
+DEFAULT_SLOT_SECONDS = 180       # assumed slot hold time until real ones have been measured
+
+class AdmissionTicket:
+    def __init__(self, user, owner, browsers=1):
+        self.user = user
+        self.browsers = browsers
+        self.owner = owner           # the waiting job's CancelToken, to find its ticket from the UI
+        self.granted = False
+        self.queued_at = time.time()
+        self.granted_at = None
+
+class AdmissionController:
+    """Caps concurrent browsers across all sessions, queuing the rest fairly.
+
+    A ticket asks for as many slots as the browsers it will run (one Maps driver, or a
+    whole RenderPool). Waiting tickets are kept in one queue per user and granted
+    round-robin across users, so one session submitting many searches cannot starve the
+    others; the next ticket in turn waits until enough slots are free rather than being
+    overtaken by smaller ones. ``queue_status`` gives a waiting job's position and expected
+    start time from recent slot hold times.
+    """
+
+    def __init__(self, slots=MAX_BROWSERS):
+        self.slots = slots
+        self.in_use = 0
+        self.queues = {}
+        self.turn = deque()
+        self.condition = threading.Condition()
+        self.hold_times = deque(maxlen=20)
+
+    def _grant(self):
+        while self.turn:
+            user = self.turn[0]
+            ticket = self.queues[user][0]
+            if self.in_use + ticket.browsers > self.slots:
+                break
+            self.turn.popleft()
+            self.queues[user].popleft()
+            if self.queues[user]:
+                self.turn.append(user)
+            else:
+                del self.queues[user]
+            ticket.granted = True
+            ticket.granted_at = time.time()
+            self.in_use += ticket.browsers
+        self.condition.notify_all()
+
+    def _withdraw(self, ticket):
+        queue_ = self.queues.get(ticket.user)
+        if queue_ and ticket in queue_:
+            queue_.remove(ticket)
+            if not queue_:
+                del self.queues[ticket.user]
+                self.turn.remove(ticket.user)
+
+    def _waiting_order(self):
+        # Round-robin interleaving: first ticket of each user in turn order, then the second...
+        order = []
+        queues = [list(self.queues[user]) for user in self.turn]
+        for depth in range(max((len(q) for q in queues), default=0)):
+            order.extend(q[depth] for q in queues if depth < len(q))
+        return order
+
+    @contextlib.contextmanager
+    def slot(self, user, browsers=1):
+        """Hold ``browsers`` slots for ``user`` while the block runs, waiting for them (cancellably) if needed."""
+        token = current_cancel_token()
+        ticket = AdmissionTicket(user, token, min(browsers, self.slots))
+        with self.condition:
+            if user not in self.queues:
+                self.queues[user] = deque()
+                self.turn.append(user)
+            self.queues[user].append(ticket)
+            self._grant()
+            try:
+                while not ticket.granted:
+                    token.check()
+                    self.condition.wait(1)
+            except BaseException:
+                # Cancelled while queued: give the place up, which may unblock the tickets behind it
+                self._withdraw(ticket)
+                self._grant()
+                raise
+        if ticket.granted_at - ticket.queued_at > 1:
+            logging.info(f"Browser slot granted after {ticket.granted_at - ticket.queued_at:.0f}s in the queue")
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_use -= ticket.browsers
+                self.hold_times.append(time.time() - ticket.granted_at)
+                self._grant()
+
+    def queue_status(self, owner):
+        """Return (position, expected start timestamp) of ``owner``'s waiting ticket, or None if it is not waiting."""
+        with self.condition:
+            order = self._waiting_order()
+            position = next((i for i, ticket in enumerate(order) if ticket.owner is owner), None)
+            if position is None:
+                return None
+            hold = sum(self.hold_times) / len(self.hold_times) if self.hold_times else DEFAULT_SLOT_SECONDS
+            # Every full round of slots ahead of this ticket takes about one average hold time
+            ahead = sum(ticket.browsers for ticket in order[:position])
+            return position + 1, time.time() + (ahead // self.slots + 1) * hold
+
+BROWSER_ADMISSION = AdmissionController()
+
+def scrape_query(search_query, store, progress, deadline=None, keep_branch_paths=False, user="anonymous", refresh=False):
+    """The scraping engine for one query, as a generator of lists of place keys whose rows just changed.
+
+    Serves the query from storage when it was refreshed within QUERY_CACHE_TTL, unless
+    ``refresh`` asks for every place to be visited again; otherwise scrapes Maps
+    (yielding each place as it is visited). It then finds emails (yielding each site's
+    places as they are enriched) and finally stores the result. Consumers can render
+    ``store`` between items to show rows while the rest are still coming. The browser
+    stages first wait for a BROWSER_ADMISSION slot, queued fairly under ``user``.
+    """
+    deadline = deadline or Deadline()
+    refreshed_at, stored_places = load_stored_places(search_query)
+    from_storage = not refresh and refreshed_at and time.time() - refreshed_at < QUERY_CACHE_TTL and stored_places
+    if from_storage:
+        logging.info(f"Serving '{search_query}' from storage ({len(stored_places)} places)")
+        for key, row in stored_places.items():
+            store.put_row(key, {k: v for k, v in row.items() if k != "scraped_at"})
+        yield list(stored_places)
+    else:
+        progress.start_stage("Waiting for a browser")
+        with BROWSER_ADMISSION.slot(user):
+            progress.start_stage("Launching browser")
+            driver = setup_chrome_driver()
+            if driver is None:
+                raise RuntimeError("Failed to initialize Chrome driver.")
+            # Stop must not wait for a page load to finish: quitting the browser aborts it
+            unregister = current_cancel_token().on_cancel(driver.quit)
+            try:
+                for key in iter_place_rows(search_query, driver, max_companies=1000, stored_places=stored_places, row_ttl=0 if refresh else PLACE_ROW_TTL, store=store, progress=progress, deadline=deadline):
+                    yield [key]
+            finally:
+                # The browser is only needed for Maps; enrichment is plain HTTP
+                unregister()
+                try:
+                    driver.quit()
+                except:
+                    pass
+    if not store.rows:
+        return
+    
+    pending = store.pending_enrichment()
+    progress.start_stage("Finding emails", total=len(pending))
+    render_candidates = yield from enrich_emails(store, pending, progress, keep_branch_paths=keep_branch_paths, deadline=deadline)
+    if render_candidates:
+        progress.start_stage("Waiting for a browser")
+        with BROWSER_ADMISSION.slot(user, browsers=RENDER_WORKERS):
+            progress.start_stage("Rendering JavaScript sites", total=sum(len(keys) for _, keys in render_candidates[:RENDER_MAX_SITES]))
+            yield from render_missing_emails(store, render_candidates, progress, deadline=deadline)
+    # A cache hit must not re-stamp the query, or a query run daily would never be scraped again
+    save_places(search_query, store.to_dataframe(), set(pending), complete=not from_storage and not deadline.partial)
+
+# Background jobs
+JOB_IDLE_TIMEOUT = 120           # seconds without a UI heartbeat before a job counts as abandoned
+
+class ScrapeJob:
+    """One query's scrape_query running on a background thread.
+
+    Reruns of the page (widget changes, downloads) do not interrupt the job; the UI polls
+    ``store`` and ``progress`` instead and ``cancel()`` stops it through its CancelToken.
+    ``status`` ends as "done", "cancelled" or "failed".
+    """
+
+    def __init__(self, search_query, keep_branch_paths=False, deadline_seconds=QUERY_DEADLINE, user="anonymous", refresh=False):
+        self.search_query = search_query
+        self.keep_branch_paths = keep_branch_paths
+        self.user = user
+        self.refresh = refresh
+        self.store = PlaceStore()
+        self.progress = RunProgress()
+        self.deadline = Deadline(deadline_seconds)
+        self.token = CancelToken(idle_timeout=JOB_IDLE_TIMEOUT)
+        self.status = "running"
+        self.error = None
+        self.run_metrics = None
+        self.thread = threading.Thread(target=self.run, daemon=True, name="scrape-job")
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        with collect_run_metrics() as run_metrics, cancellable(self.token):
+            try:
+                for _ in scrape_query(self.search_query, self.store, self.progress, self.deadline, self.keep_branch_paths, self.user, self.refresh):
+                    pass
+                self.status = "done"
+            except Cancelled:
+                logging.info(f"Job for '{self.search_query}' {self.token.reason}")
+                self.status = "cancelled"
+            except Exception as e:
+                logging.error(f"Job for '{self.search_query}' failed: {str(e)}")
+                self.error = str(e)
+                self.status = "failed"
+            finally:
+                self.run_metrics = run_metrics.summary()
+
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def queue_status(self):
+        """(position, expected start timestamp) while waiting for a browser slot, else None."""
+        return BROWSER_ADMISSION.queue_status(self.token)
+
+    def cancel(self):
+        self.token.cancel()
+
+EXPORT_COLUMNS = ["Name", "Address", "Phone Number", "Website", "Email", "Email Source"]
+
+class XlsxStreamWriter:
+    """Constant-memory XLSX export.
+
+    Uses an openpyxl write-only worksheet, which serializes each appended row straight to
+    disk, so rows can be written as they are produced without keeping the workbook's
+    object model in RAM. ``close()`` saves the workbook (to a new temp file unless a path
+    is given) and returns its path.
+    """
+
+    def __init__(self, columns=EXPORT_COLUMNS):
+        self.columns = columns
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(columns)
+
+    def append(self, values):
+        """Append one row given as values in ``columns`` order."""
+        self.sheet.append(list(values))
+
+    def close(self, path=None):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="calibrage_", suffix=".xlsx")
+            os.close(fd)
+        self.workbook.save(path)
+        return path
+
+EXPORT_FORMATS = {
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV", "text/csv"),
+    "jsonl": ("JSONL", "application/x-ndjson"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_CACHE_SIZE = 32   # result-set versions whose generated files are kept on disk
+
+_export_cache = {}
+_export_cache_lock = threading.Lock()   # guards _export_cache and _export_key_locks only
+_export_key_locks = {}                 # (version, fmt) -> lock held while that file is generated
+
+def write_export(df, fmt, path):
+    """Write the result DataFrame to ``path`` in the given export format."""
+    if fmt == "xlsx":
+        writer = XlsxStreamWriter()
+        # Tuples straight from the frame's columns; no per-row dict is built
+        for values in df.reindex(columns=writer.columns).itertuples(index=False, name=None):
+            writer.append(values)
+        writer.close(path)
+    elif fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "jsonl":
+        df.to_json(path, orient="records", lines=True, force_ascii=False)
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+def get_export_file(df, version, fmt):
+    """Return the export file for a result-set version, generating it on first request.
+
+    Download callbacks run outside the script thread, so the cache is module-level and
+    keyed by the result-set version rather than kept in session state. Generation holds
+    only that key's lock, so other exports are served while a large file is written.
+    """
+    key = (version, fmt)
+    with _export_cache_lock:
+        key_lock = _export_key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        with _export_cache_lock:
+            path = _export_cache.get(key)
+        if path and os.path.exists(path):
+            return path
+        fd, path = tempfile.mkstemp(prefix="calibrage_", suffix=f".{fmt}")
+        os.close(fd)
+        start = time.time()
+        write_export(df, fmt, path)
+        logging.info(f"Generated {fmt} export of {len(df)} rows in {time.time() - start:.2f}s")
+    with _export_cache_lock:
+        _export_cache[key] = path
+        versions = list(dict.fromkeys(v for v, _ in _export_cache))
+        for old_version in versions[:-EXPORT_CACHE_SIZE]:
+            for old_fmt in EXPORT_FORMATS:
+                _export_key_locks.pop((old_version, old_fmt), None)
+                old_path = _export_cache.pop((old_version, old_fmt), None)
+                if old_path and os.path.exists(old_path):
+                    os.remove(old_path)
+    return path
+
+def read_export_file(path):
+    """Read an export file from disk when its download is requested."""
+    with open(path, "rb") as f:
+        return f.read()
+
+def render_download_buttons(download_placeholder, df, version):
+    """Show one download button per export format; files are generated only when clicked."""
+    columns = download_placeholder.container().columns(len(EXPORT_FORMATS))
+    for column, (fmt, (label, mime)) in zip(columns, EXPORT_FORMATS.items()):
+        column.download_button(
+            label=f"Download {label}",
+            data=lambda fmt=fmt: read_export_file(get_export_file(df, version, fmt)),
+            file_name=f"Calibrage_Data_Extraction.{fmt}",
+            mime=mime,
+            key=f"download_{fmt}",
+            on_click="ignore"
+        )
+
+class ResultsView:
+    """Paginated results table.
+
+    Filtering, sorting and paging happen on the server over the buffered DataFrame and only
+    the visible page is sent to the browser. ``update()`` can be called after every new row;
+    the page is re-sent only when its contents actually changed.
+    """
+
+    PAGE_SIZES = (25, 50, 100, 250)
+    FEED_ORDER = "(feed order)"
+
+    def __init__(self, container):
+        with container:
+            filter_col, sort_col, order_col, size_col, page_col = st.columns([3, 2, 1, 1, 1])
+            self.filter_text = filter_col.text_input("Filter", key="results_filter", placeholder="Filter rows...")
+            self.sort_by = sort_col.selectbox("Sort by", [self.FEED_ORDER] + EXPORT_COLUMNS, key="results_sort")
+            self.descending = order_col.checkbox("Descending", key="results_descending")
+            self.page_size = size_col.selectbox("Rows per page", self.PAGE_SIZES, key="results_page_size")
+            self.page = page_col.number_input("Page", min_value=1, step=1, key="results_page")
+            self.table = st.empty()
+            self.caption = st.empty()
+        self._signature = None
+
+    def visible_rows(self, df):
+        """Return (page rows, number of matching rows, number of pages) for the current controls."""
+        if self.filter_text:
+            text = df.astype(str)
+            mask = text.apply(lambda column: column.str.contains(self.filter_text, case=False, regex=False)).any(axis=1)
+            df = df[mask]
+        if self.sort_by != self.FEED_ORDER and self.sort_by in df.columns:
+            df = df.sort_values(self.sort_by, ascending=not self.descending, kind="stable")
+        matched = len(df)
+        pages = max(1, -(-matched // self.page_size))
+        page = min(int(self.page), pages)
+        start = (page - 1) * self.page_size
+        return df.iloc[start:start + self.page_size], matched, pages
+
+    def update(self, df):
+        """Re-send the visible page if it differs from what the browser already shows."""
+        page_df, matched, pages = self.visible_rows(df)
+        signature = (matched, pages, tuple(pd.util.hash_pandas_object(page_df, index=False)))
+        if signature == self._signature:
+            return
+        self._signature = signature
+        self.table.dataframe(page_df, hide_index=True)
+        self.caption.caption(f"Page {min(int(self.page), pages)} of {pages} · {matched} of {len(df)} rows")
+
+# Seconds between table refreshes while rows are streaming in
+RESULTS_REFRESH_INTERVAL = 1.0
+
+def render_results(table_placeholder, success_placeholder, download_placeholder, view=None):
+    """Render the session's current result set, into ``view`` if the table is already on the page."""
+    df = st.session_state.results_df
+    (view or ResultsView(table_placeholder.container())).update(df)
+    with success_placeholder.container():
+        st.success("Done! 👇Click Download Button Below")
+        cut_stages = st.session_state.get("results_partial")
+        if st.session_state.get("results_stopped"):
+            st.warning(f"Search stopped: showing the {len(df)} rows gathered before it was stopped.")
+        elif cut_stages:
+            st.warning(
+                f"Partial results: the time limit ran out during {', '.join(cut_stages)}. "
+                f"Showing the {len(df)} rows gathered so far; rows marked \"not checked\" had no email lookup."
+            )
+        run_metrics = st.session_state.get("run_metrics")
+        if run_metrics is not None and not run_metrics.empty:
+            with st.expander("Run timings"):
+                st.dataframe(run_metrics, hide_index=True)
+    render_download_buttons(download_placeholder, df, st.session_state.results_version)
+
+def run_scraping(search_query, progress_placeholder, table_placeholder, success_placeholder, download_placeholder, keep_branch_paths=False, deadline_seconds=QUERY_DEADLINE, refresh=False):
+    """Start a background job for the given search query, within ``deadline_seconds`` if set, and watch it.
+
+    ``refresh`` bypasses the stored results and visits every place again.
+    """
+    if not search_query.strip():
+        st.error("Please enter a valid search query.")
+        return
+    
+    previous = st.session_state.get("job")
+    if previous is not None and previous.is_running():
+        previous.cancel()
+    st.session_state.scraping_completed = False
+    user = st.session_state.setdefault("user_id", uuid.uuid4().hex)
+    st.session_state.job = ScrapeJob(search_query, keep_branch_paths, deadline_seconds, user, refresh).start()
+    watch_job(progress_placeholder, table_placeholder, success_placeholder, download_placeholder)
+
+def watch_job(progress_placeholder, table_placeholder, success_placeholder, download_placeholder):
+    """Show the session's job while it runs, with a Stop button, then publish its results.
+
+    Polling sends the UI heartbeat that keeps the job alive; a rerun (such as pressing Stop)
+    interrupts this loop and the next run picks the job up again.
+    """
+    job = st.session_state.job
+    reporter = ProgressReporter(progress_placeholder)
+    if job.is_running():
+        if success_placeholder.button("Stop", key="stop_job", type="secondary"):
+            job.cancel()
+    view = None
+    while job.is_running():
+        # Show rows as they arrive, redrawing at most once per RESULTS_REFRESH_INTERVAL
+        job.token.touch()
+        waiting = job.queue_status()
+        if waiting:
+            position, starts_at = waiting
+            wait = max(starts_at - time.time(), 0)
+            progress_placeholder.info(
+                f"All browsers are busy. You are number {position} in the queue; "
+                f"expected start in about {int(wait // 60)}m {int(wait % 60):02d}s."
+            )
+        else:
+            reporter.flush(job.progress)
+        df = job.store.to_dataframe()
+        if df is not None:
+            if view is None:
+                view = ResultsView(table_placeholder.container())
+            view.update(df.reset_index(drop=True))
+        time.sleep(RESULTS_REFRESH_INTERVAL)
+    reporter.flush(job.progress)
+    
+    st.session_state.job = None
+    df = job.store.to_dataframe()
+    if job.status == "failed":
+        st.error(f"An error occurred during scraping: {job.error}")
+    if df is not None and not df.empty:
+        st.session_state.scraping_completed = True
+        st.session_state.results_df = df.reset_index(drop=True)
+        st.session_state.results_partial = list(job.deadline.cut_stages)
+        st.session_state.results_stopped = job.status == "cancelled"
+        st.session_state.results_version = uuid.uuid4().hex
+        st.session_state.run_metrics = job.run_metrics
+        render_results(table_placeholder, success_placeholder, download_placeholder, view)
+    elif job.status == "cancelled":
+        success_placeholder.info("Search stopped before any results were found.")
+    elif job.status == "done":
+        st.warning("No results found for the given search query.")
+
 def main():
     st.set_page_config(
         page_title="Calibrage Info Systems",
         page_icon="🔍",
         layout="wide"
     )
+    start_metrics_server()
 
     # 1. Site title
     st.title("🔍 Calibrage Info Systems Data Search Engine")
@@ -246,20 +2494,31 @@ def main():
     
     # 3. Search term input
     search_query = st.text_input("", key="search_input", on_change=lambda: setattr(st.session_state, 'force_run', True))
+    refresh = st.button("Refresh results", help="Ignore stored results and scrape every place again.")
     
     # Sidebar system info
     st.sidebar.markdown("### System Information")
     st.sidebar.text(f"Python: {platform.python_version()}")
     st.sidebar.text(f"System: {platform.system()}")
     st.sidebar.text(f"Platform: {platform.platform()}")
+    st.sidebar.markdown("### Options")
+    keep_branch_paths = st.sidebar.checkbox(
+        "Crawl branch pages separately",
+        help="Listings sharing a website host are crawled once; tick this when branches have their own pages (e.g. example.com/guntur)."
+    )
+    time_limit = st.sidebar.number_input(
+        "Time limit per query (minutes)",
+        min_value=0.0, value=QUERY_DEADLINE / 60, step=1.0,
+        help="0 means no limit. When the limit is reached the rows gathered so far are returned, marked partial."
+    )
     
     # Session state initialization
     if 'scraping_completed' not in st.session_state:
         st.session_state.scraping_completed = False
     if 'previous_query' not in st.session_state:
         st.session_state.previous_query = ""
-    if 'download_clicked' not in st.session_state:
-        st.session_state.download_clicked = False
+    if 'results_df' not in st.session_state:
+        st.session_state.results_df = None
     if 'force_run' not in st.session_state:
         st.session_state.force_run = False
     
@@ -270,7 +2529,7 @@ def main():
     download_placeholder = st.empty()  # 7. Download button
     
     # Trigger scraping on new search query or force run
-    if (search_query.strip() and search_query != st.session_state.previous_query) or st.session_state.force_run:
+    if (search_query.strip() and search_query != st.session_state.previous_query) or st.session_state.force_run or refresh:
         st.session_state.previous_query = search_query
         st.session_state.force_run = False  # Reset the force_run flag
         run_scraping(
@@ -278,17 +2537,17 @@ def main():
             progress_placeholder,
             table_placeholder,
             success_placeholder,
-            download_placeholder
+            download_placeholder,
+            keep_branch_paths=keep_branch_paths,
+            deadline_seconds=time_limit * 60,
+            refresh=refresh
         )
-    
-    # Clear UI after download
-    if st.session_state.download_clicked:
-        progress_placeholder.empty()
-        table_placeholder.empty()
-        success_placeholder.empty()
-        download_placeholder.empty()
-        st.session_state.scraping_completed = False
-        st.session_state.download_clicked = False
+    elif st.session_state.get("job") is not None:
+        # A job started by an earlier run is still going (or just finished)
+        watch_job(progress_placeholder, table_placeholder, success_placeholder, download_placeholder)
+    elif st.session_state.scraping_completed and st.session_state.results_df is not None:
+        # Keep showing the last results on reruns; downloads do not rerun the script
+        render_results(table_placeholder, success_placeholder, download_placeholder)
 
 if __name__ == "__main__":
     main()